@@ -12,13 +12,18 @@ from src.patch.constants import GIT, SVN, HG, PLAIN
 import sys
 import os
 import ast
+import logging
 import tempfile
 import shutil
 from pathlib import Path
 from typing import TypedDict
 
 # Add src to path
-sys.path.insert(0, str(Path(__file__).parent / "src"))
+_SRC_DIR = str(Path(__file__).parent / "src")
+if _SRC_DIR not in sys.path:
+    sys.path.insert(0, _SRC_DIR)
+
+log = logging.getLogger("measure_coverage")
 
 
 class CoverageAnalyzer:
@@ -36,14 +41,14 @@ class CoverageAnalyzer:
 
     def analyze_module_coverage(self, module_path: Path) -> None:
         """Analyze coverage for a specific module."""
-        print(f"\n📁 Analyzing {module_path.name}...")
+        log.debug("\n📁 Analyzing %s...", module_path.name)
 
         # Parse the AST to find all functions and classes
         with open(module_path, "r", encoding="utf-8") as f:
             try:
                 tree = ast.parse(f.read())
             except SyntaxError as e:
-                print(f"   ⚠️  Syntax error in {module_path}: {e}")
+                log.warning("   ⚠️  Syntax error in %s: %s", module_path, e)
                 return
 
         functions = []
@@ -68,13 +73,13 @@ class CoverageAnalyzer:
             "total_items": len(functions) + len(classes),
         }
 
-        print(
-            f"   Found {len(functions)} functions and {len(classes)} classes")
+        log.debug(
+            "   Found %d functions and %d classes", len(functions), len(classes))
         self.total_functions += len(functions)
 
     def test_function_coverage(self) -> set:
         """Test coverage of key functions by actually calling them."""
-        print("\n🧪 Testing function coverage...")
+        log.debug("\n🧪 Testing function coverage...")
 
         tested_functions = set()
 
@@ -105,15 +110,14 @@ class CoverageAnalyzer:
                         break
                     break
         except Exception as e:
-            print(f"   ⚠️  Error testing fromstring: {e}")
+            log.warning("   ⚠️  Error testing fromstring: %s", e)
 
         # Test fromfile with temp file
         try:
             temp_dir = tempfile.mkdtemp()
             try:
                 patch_file = os.path.join(temp_dir, "test.patch")
-                with open(patch_file, "wb") as f:
-                    f.write(patch_content)
+                Path(patch_file).write_bytes(patch_content)
 
                 patchset = fromfile(patch_file)
                 if patchset:
@@ -121,7 +125,7 @@ class CoverageAnalyzer:
             finally:
                 shutil.rmtree(temp_dir)
         except Exception as e:
-            print(f"   ⚠️  Error testing fromfile: {e}")
+            log.warning("   ⚠️  Error testing fromfile: %s", e)
 
         # Test utility functions
         try:
@@ -138,7 +142,7 @@ class CoverageAnalyzer:
             pathstrip(b"a/b/c/file.txt", 1)
             tested_functions.add("pathstrip")
         except Exception as e:
-            print(f"   ⚠️  Error testing utilities: {e}")
+            log.warning("   ⚠️  Error testing utilities: %s", e)
 
         # Test constants
         try:
@@ -148,7 +152,7 @@ class CoverageAnalyzer:
             assert PLAIN == "plain"
             tested_functions.add("constants")
         except Exception as e:
-            print(f"   ⚠️  Error testing constants: {e}")
+            log.warning("   ⚠️  Error testing constants: %s", e)
 
         # Test error handling
         try:
@@ -156,17 +160,18 @@ class CoverageAnalyzer:
             assert result is False
             tested_functions.add("error_handling")
         except Exception as e:
-            print(f"   ⚠️  Error testing error handling: {e}")
+            log.warning("   ⚠️  Error testing error handling: %s", e)
 
         self.tested_functions = len(tested_functions)
-        print(
-            f"   ✅ Successfully tested {len(tested_functions)} functions/features")
+        log.debug(
+            "   ✅ Successfully tested %d functions/features",
+            len(tested_functions))
 
         return tested_functions
 
     def analyze_test_files(self) -> dict:
         """Analyze what our test files cover."""
-        print("\n📋 Analyzing test file coverage...")
+        log.debug("\n📋 Analyzing test file coverage...")
 
         test_files = [
             "tests_pytest/test_core.py",
@@ -179,6 +184,7 @@ class CoverageAnalyzer:
             "tests_pytest/test_cli.py",
             "tests_pytest/test_integration.py",
             "tests_pytest/test_coverage_boost.py",
+            "tests_pytest/test_coverage.py",
         ]
 
         test_coverage = {}
@@ -197,8 +203,11 @@ class CoverageAnalyzer:
                     "test_classes": test_classes,
                 }
 
-                print(
-                    f"   {test_file}: {test_methods} test methods, {test_classes} test classes"
+                log.debug(
+                    "   %s: %d test methods, %d test classes",
+                    test_file,
+                    test_methods,
+                    test_classes,
                 )
 
         total_test_methods = sum(
@@ -208,8 +217,10 @@ class CoverageAnalyzer:
             data["test_classes"] for data in test_coverage.values()
         )
 
-        print(
-            f"\n   📊 Total: {total_test_methods} test methods in {total_test_classes} test classes"
+        log.debug(
+            "\n   📊 Total: %d test methods in %d test classes",
+            total_test_methods,
+            total_test_classes,
         )
 
         return test_coverage
@@ -344,6 +355,10 @@ class CoverageAnalyzer:
 
 def main() -> bool:
     """Main function."""
+    # per-step progress is only shown when not running with --quiet
+    if not log.handlers:
+        log.addHandler(logging.StreamHandler(sys.stdout))
+    log.setLevel(logging.INFO if "--quiet" in sys.argv else logging.DEBUG)
     analyzer = CoverageAnalyzer()
     coverage = analyzer.run_comprehensive_coverage_analysis()
 
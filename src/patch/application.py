@@ -7,16 +7,29 @@ Available under the terms of MIT license
 
 import os
 import shutil
-from os.path import exists, abspath
-from typing import Optional, List, Iterator, Union, IO, TYPE_CHECKING
-
-from .compat import tostr
+import sys
+import tempfile
+from itertools import islice
+from os.path import abspath
+from typing import Optional, Dict, List, Iterator, Union, IO, TYPE_CHECKING
+
+from .compat import fadvise_sequential, tostr
+from .core import _count_lineends, _iter_file_lines
 from .logging_utils import debug
 
 if TYPE_CHECKING:
     from .core import PatchSet, Hunk
 
 
+# hunk line operations, keyed by the first byte of a hunk line
+_OP_CONTEXT, _OP_DELETE, _OP_INSERT, _OP_NOEOL = range(4)
+_HUNK_OP = {b" ": _OP_CONTEXT, b"-": _OP_DELETE, b"+": _OP_INSERT, b"\\": _OP_NOEOL}
+# prefixes exchanged by reverse_patchset()
+_REVERSE_PREFIX = {b"+": b"-", b"-": b"+"}
+# lines copied per batch between hunks, bounds memory use on large files
+_GAP_BATCH = 1024
+
+
 def diffstat(patchset: "PatchSet") -> str:
     """Calculate diffstat for a PatchSet and return as formatted string.
 
@@ -44,9 +57,8 @@ def diffstat(patchset: "PatchSet") -> str:
         - Single + or - characters are preserved in histogram
         - Calculates byte size changes in addition to line changes
     """
-    names = []
-    insert = []
-    delete = []
+    stats = []  # (target, insertions, deletions) per file
+    inserts = deletes = 0
     delta = 0  # size change in bytes
     namelen = 0
     maxdiff = 0  # max number of changes for single file
@@ -55,51 +67,63 @@ def diffstat(patchset: "PatchSet") -> str:
         i, d = 0, 0
         for hunk in patch.hunks:
             for line in hunk.text:
-                if line.startswith(b"+"):
+                op = _HUNK_OP.get(line[:1], _OP_CONTEXT)
+                if op == _OP_CONTEXT:
+                    continue
+                if op == _OP_INSERT:
                     i += 1
                     delta += len(line) - 1
-                elif line.startswith(b"-"):
+                elif op == _OP_DELETE:
                     d += 1
                     delta -= len(line) - 1
-        names.append(patch.target)
-        insert.append(i)
-        delete.append(d)
+        stats.append((patch.target, i, d))
+        inserts += i
+        deletes += d
         if patch.target is not None:
             namelen = max(namelen, len(patch.target))
         maxdiff = max(maxdiff, i + d)
-    output = ""
+
     statlen = len(str(maxdiff))  # stats column width
-    for i, _ in enumerate(names):
-        # %-19s | %-4d %s
-        format = " %-" + str(namelen) + "s | %" + str(statlen) + "s %s\n"
+    # %-19s | %-4d %s
+    format = " %-" + str(namelen) + "s | %" + str(statlen) + "s %s\n"
+    width = len(format % ("", "", ""))
+    histwidth = max(2, 80 - width)
 
-        hist = ""
+    output = []
+    for name, i, d in stats:
         # -- calculating histogram --
-        width = len(format % ("", "", ""))
-        histwidth = max(2, 80 - width)
         if maxdiff < histwidth:
-            hist = "+" * insert[i] + "-" * delete[i]
+            hist = "+" * i + "-" * d
         else:
-            iratio = (float(insert[i]) / maxdiff) * histwidth
-            dratio = (float(delete[i]) / maxdiff) * histwidth
+            iratio = (float(i) / maxdiff) * histwidth
+            dratio = (float(d) / maxdiff) * histwidth
 
             # make sure every entry gets at least one + or -
             iwidth = 1 if 0 < iratio < 1 else int(iratio)
             dwidth = 1 if 0 < dratio < 1 else int(dratio)
-            # print(iratio, dratio, iwidth, dwidth, histwidth)
-            hist = "+" * int(iwidth) + "-" * int(dwidth)
+            hist = "+" * iwidth + "-" * dwidth
         # -- /calculating +- histogram --
-        name = names[i]
         filename_str = tostr(name) if name is not None else ""
-        output += format % (filename_str, str(insert[i] + delete[i]), hist)
+        output.append(format % (filename_str, str(i + d), hist))
 
-    output += " %d files changed, %d insertions(+), %d deletions(-), %+d bytes" % (
-        len(names),
-        sum(insert),
-        sum(delete),
-        delta,
+    output.append(
+        " %d files changed, %d insertions(+), %d deletions(-), %+d bytes"
+        % (len(stats), inserts, deletes, delta)
     )
-    return output
+    return "".join(output)
+
+
+def _exists(path: bytes) -> bool:
+    """Return True if path exists, using a single stat() call.
+
+    Unlike os.path.exists() on a decoded name, the bytes path is passed
+    to the OS as is, so no decoding is done per lookup.
+    """
+    try:
+        os.stat(path)
+    except (OSError, ValueError):
+        return False
+    return True
 
 
 def findfile(old: Optional[bytes], new: Optional[bytes]) -> Optional[bytes]:
@@ -138,9 +162,9 @@ def findfile(old: Optional[bytes], new: Optional[bytes]) -> Optional[bytes]:
     if not old or not new:
         return None
 
-    if exists(old.decode("utf-8", errors="replace")):
+    if _exists(old):
         return old
-    elif exists(new.decode("utf-8", errors="replace")):
+    elif _exists(new):
         return new
     else:
         # [w] Google Code generates broken patches with its online editor
@@ -149,9 +173,9 @@ def findfile(old: Optional[bytes], new: Optional[bytes]) -> Optional[bytes]:
             old, new = old[2:], new[2:]
             debug("   %r" % old)
             debug("   %r" % new)
-            if exists(old.decode("utf-8", errors="replace")):
+            if _exists(old):
                 return old
-            elif exists(new.decode("utf-8", errors="replace")):
+            elif _exists(new):
                 return new
         return None
 
@@ -194,6 +218,8 @@ def can_patch(patchset: "PatchSet", filename: Union[str, bytes]) -> Optional[boo
         filename_str = filename
 
     filename_abs = abspath(filename_str)
+    filename_base = os.path.basename(filename_abs)
+    candidate = None
     for p in patchset.items:
         # Handle both absolute and relative path matching
         source_path = p.source
@@ -205,13 +231,20 @@ def can_patch(patchset: "PatchSet", filename: Union[str, bytes]) -> Optional[boo
         else:
             source_path_str = source_path
 
+        # Equal paths have equal basenames, so abspath() and its getcwd()
+        # call are only needed for entries whose basename matches
+        if filename_base != os.path.basename(source_path_str):
+            continue
+
         # Try absolute path comparison
         if filename_abs == abspath(source_path_str):
             return match_file_hunks(filename_str, p.hunks)
 
-        # Try basename comparison for relative paths
-        if os.path.basename(filename_abs) == os.path.basename(source_path_str):
-            return match_file_hunks(filename_str, p.hunks)
+        # Fall back to the first basename match for relative paths
+        if candidate is None:
+            candidate = p
+    if candidate is not None:
+        return match_file_hunks(filename_str, candidate.hunks)
     return None
 
 
@@ -246,74 +279,61 @@ def match_file_hunks(filepath: Union[str, bytes], hunks: List["Hunk"]) -> bool:
     else:
         filepath_str = filepath
 
-    fp = open(abspath(filepath_str), "rb")
+    lines = _iter_file_lines(abspath(filepath_str))
 
     class NoMatch(Exception):
         pass
 
-    lineno = 1
-    line = fp.readline()
+    lineno = 1  # number of the next line to be read from the file
     hno = None
     try:
         for hno, h in enumerate(hunks):
             # skip to first line of the hunk
-            if h.starttgt is not None:
-                while lineno < h.starttgt:
-                    if not len(line):  # eof
-                        debug(
-                            "check failed - premature eof before hunk: %d" % (
-                                hno + 1)
-                        )
-                        raise NoMatch
-                    line = fp.readline()
-                    lineno += 1
-            for hline in h.text:
-                if hline.startswith(b"-"):
-                    continue
-                if not len(line):
-                    debug("check failed - premature eof on hunk: %d" % (hno + 1))
-                    # todo: \ No newline at the end of file
-                    raise NoMatch
-                if line.rstrip(b"\r\n") != hline[1:].rstrip(b"\r\n"):
-                    debug("file is not patched - failed hunk: %d" % (hno + 1))
+            if h.starttgt is not None and lineno < h.starttgt:
+                skipped = 0
+                for _ in islice(lines, h.starttgt - lineno):
+                    skipped += 1
+                if lineno + skipped < h.starttgt:
+                    debug(
+                        "check failed - premature eof before hunk: %d" % (
+                            hno + 1)
+                    )
                     raise NoMatch
-                line = fp.readline()
-                lineno += 1
+                lineno = h.starttgt
+            # compare the whole hunk at once, list equality runs in C
+            expected = [
+                hline[1:].rstrip(b"\r\n") for hline in h.text if hline[:1] != b"-"
+            ]
+            found = [line.rstrip(b"\r\n") for line in islice(lines, len(expected))]
+            lineno += len(found)
+            if found != expected[: len(found)]:
+                debug("file is not patched - failed hunk: %d" % (hno + 1))
+                raise NoMatch
+            if len(found) < len(expected):
+                debug("check failed - premature eof on hunk: %d" % (hno + 1))
+                # todo: \ No newline at the end of file
+                raise NoMatch
 
     except NoMatch:
         matched = False
         # todo: display failed hunk, i.e. expected/found
 
-    fp.close()
+    lines.close()
     return matched
 
 
-def patch_stream(instream: IO[bytes], hunks: List["Hunk"]) -> Iterator[bytes]:
-    """Apply hunks to an input stream and yield the patched output.
+def _single_lineend(lineends: Dict[bytes, int]) -> Optional[bytes]:
+    """Return the only line end counted in lineends, or None if not exactly one."""
+    seen = [end for end, count in lineends.items() if count]
+    return seen[0] if len(seen) == 1 else None
 
-    Generator function that reads from the input stream and applies the
-    provided hunks, yielding the resulting patched lines. Automatically
-    detects and converts line endings to match the input format.
 
-    Args:
-        instream (IO[bytes]): Input byte stream to patch.
-        hunks (List[Hunk]): List of hunks to apply to the stream.
-
-    Yields:
-        bytes: Patched lines from the stream with appropriate line endings.
+def _patch_hunks(instream: IO[bytes], hunks: List["Hunk"]) -> Iterator[bytes]:
+    """Yield patched lines of instream up to the end of the last hunk.
 
-    Example:
-        >>> with open('input.txt', 'rb') as f:
-        ...     patched_lines = list(patch_stream(f, patch.hunks))
-        >>> with open('output.txt', 'wb') as f:
-        ...     f.writelines(patched_lines)
-
-    Note:
-        - Line endings are automatically converted to match input format
-        - Handles mixed line endings with warnings
-        - Preserves original line ending style (LF, CRLF, CR)
+    The rest of the stream is left unread, so that callers can copy it
+    in bulk instead of line by line.
     """
-
     # todo: At the moment substituted lineends may not be the same
     #       at the start and at the end of patching. Also issue a
     #       warning/throw about mixed lineends (is it really needed?)
@@ -323,50 +343,93 @@ def patch_stream(instream: IO[bytes], hunks: List["Hunk"]) -> Iterator[bytes]:
     srclineno = 1
 
     lineends = {b"\n": 0, b"\r\n": 0, b"\r": 0}
+    # the only line end seen so far, or None if there is none yet or they
+    # are mixed; only changes when a line end shows up for the first time
+    newline: Optional[bytes] = None
 
     def get_line() -> bytes:
         """
         local utility function - return line from source stream
         collecting line end statistics on the way
         """
+        nonlocal newline
         line = instream.readline()
         # 'U' mode works only with text files
         if line.endswith(b"\r\n"):
-            lineends[b"\r\n"] += 1
+            end = b"\r\n"
         elif line.endswith(b"\n"):
-            lineends[b"\n"] += 1
+            end = b"\n"
         elif line.endswith(b"\r"):
-            lineends[b"\r"] += 1
+            end = b"\r"
+        else:
+            return line
+        lineends[end] += 1
+        if lineends[end] == 1:
+            newline = _single_lineend(lineends)
         return line
 
     for hno, h in enumerate(hunks_iter):
         debug("hunk %d" % (hno + 1))
-        # skip to line just before hunk starts
-        if h.startsrc is not None:
-            while srclineno < h.startsrc:
-                yield get_line()
-                srclineno += 1
+        # copy lines up to the hunk start in small batches
+        while h.startsrc is not None and srclineno < h.startsrc:
+            gap = list(islice(instream, min(h.startsrc - srclineno, _GAP_BATCH)))
+            if not gap:
+                break
+            lf, crlf, cr = _count_lineends(gap)
+            lineends[b"\n"] += lf
+            lineends[b"\r\n"] += crlf
+            lineends[b"\r"] += cr
+            newline = _single_lineend(lineends)
+            yield from gap
+            srclineno += len(gap)
 
         for hline in h.text:
             # todo: check \ No newline at the end of file
-            if hline.startswith(b"-") or hline.startswith(b"\\"):
+            op = _HUNK_OP.get(hline[:1], _OP_CONTEXT)
+            if op == _OP_DELETE or op == _OP_NOEOL:
                 get_line()
                 srclineno += 1
                 continue
             else:
-                if not hline.startswith(b"+"):
+                if op != _OP_INSERT:
                     get_line()
                     srclineno += 1
                 line2write = hline[1:]
-                # detect if line ends are consistent in source file
-                if sum([bool(lineends[x]) for x in lineends]) == 1:
-                    newline = [x for x in lineends if lineends[x] != 0][0]
+                # convert only if line ends are consistent in source file
+                if newline is not None:
                     yield line2write.rstrip(b"\r\n") + newline
                 else:  # newlines are mixed
                     yield line2write
 
-    for line in instream:
-        yield line
+
+def patch_stream(instream: IO[bytes], hunks: List["Hunk"]) -> Iterator[bytes]:
+    """Apply hunks to an input stream and yield the patched output.
+
+    Generator function that reads from the input stream and applies the
+    provided hunks, yielding the resulting patched lines. Automatically
+    detects and converts line endings to match the input format.
+
+    Args:
+        instream (IO[bytes]): Input byte stream to patch.
+        hunks (List[Hunk]): List of hunks to apply to the stream.
+
+    Yields:
+        bytes: Patched lines from the stream with appropriate line endings.
+
+    Example:
+        >>> with open('input.txt', 'rb') as f:
+        ...     patched = b''.join(patch_stream(f, patch.hunks))
+        >>> # or stream straight into a file without building the result
+        >>> with open('input.txt', 'rb') as f, open('output.txt', 'wb') as out:
+        ...     out.writelines(patch_stream(f, patch.hunks))
+
+    Note:
+        - Line endings are automatically converted to match input format
+        - Handles mixed line endings with warnings
+        - Preserves original line ending style (LF, CRLF, CR)
+    """
+    yield from _patch_hunks(instream, hunks)
+    yield from instream
 
 
 def write_hunks(
@@ -393,7 +456,8 @@ def write_hunks(
 
     Note:
         - Source file permissions are copied to the target file
-        - Target file is created or overwritten
+        - Target file is created or replaced in a single rename, so it is
+          never left partially written
         - Uses patch_stream() internally for the actual patching
     """
     if isinstance(srcname, bytes):
@@ -406,51 +470,66 @@ def write_hunks(
     else:
         tgtname_str = tgtname
 
-    src = open(srcname_str, "rb")
-    tgt = open(tgtname_str, "wb")
-
-    debug("processing target file %r" % tgtname)
-
-    tgt.writelines(patch_stream(src, hunks))
-
-    tgt.close()
-    src.close()
-    # [ ] TODO: add test for permission copy
-    shutil.copymode(srcname_str, tgtname_str)
+    # write into a temporary file next to the target and move it into
+    # place at the end, so the target is never left half written
+    fd, tmpname = tempfile.mkstemp(
+        dir=os.path.dirname(abspath(tgtname_str)), suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as tgt, open(srcname_str, "rb") as src:
+            fadvise_sequential(src.fileno())
+            debug("processing target file %r" % tgtname)
+
+            tgt.writelines(_patch_hunks(src, hunks))
+            # lines after the last hunk are copied unchanged, in large blocks
+            shutil.copyfileobj(src, tgt)
+
+        shutil.copymode(srcname_str, tmpname)
+        os.replace(tmpname, tgtname_str)
+    except BaseException:
+        os.unlink(tmpname)
+        raise
     return True
 
 
 def reverse_patchset(patchset: "PatchSet") -> None:
     """reverse patch direction (this doesn't touch filenames)"""
+    swap = _REVERSE_PREFIX
     for p in patchset.items:
         for h in p.hunks:
             h.startsrc, h.starttgt = h.starttgt, h.startsrc
             h.linessrc, h.linestgt = h.linestgt, h.linessrc
-            for i, line in enumerate(h.text):
-                # need to use line[0:1] here, because line[0]
-                # returns int instead of bytes on Python 3
-                if line[0:1] == b"+":
-                    h.text[i] = b"-" + line[1:]
-                elif line[0:1] == b"-":
-                    h.text[i] = b"+" + line[1:]
+            # need to use line[:1] here, because line[0]
+            # returns int instead of bytes on Python 3
+            h.text[:] = [
+                swap[line[:1]] + line[1:] if line[:1] in swap else line
+                for line in h.text
+            ]
+            h.finalize()
 
 
 def dump_patchset(patchset: "PatchSet") -> None:
+    """print patchset in unified diff format to stdout
+
+    Lines are collected into one buffer which is decoded and written
+    with a single call instead of a print() per line.
+    """
+    parts: List[bytes] = []
     for p in patchset.items:
         for headline in p.header:
-            print(headline.rstrip(b"\n").decode("utf-8", errors="replace"))
-        if p.source is not None:
-            print("--- " + p.source.decode("utf-8", errors="replace"))
-        else:
-            print("--- /dev/null")
-        if p.target is not None:
-            print("+++ " + p.target.decode("utf-8", errors="replace"))
-        else:
-            print("+++ /dev/null")
+            parts.append(headline.rstrip(b"\n"))
+        parts.append(b"--- " + (p.source if p.source is not None else b"/dev/null"))
+        parts.append(b"+++ " + (p.target if p.target is not None else b"/dev/null"))
         for h in p.hunks:
-            print(
-                "@@ -%s,%s +%s,%s @@" % (h.startsrc,
-                                         h.linessrc, h.starttgt, h.linestgt)
+            hunkhead = "@@ -%s,%s +%s,%s @@" % (
+                h.startsrc,
+                h.linessrc,
+                h.starttgt,
+                h.linestgt,
             )
+            parts.append(hunkhead.encode("ascii"))
             for line in h.text:
-                print(line.rstrip(b"\n").decode("utf-8", errors="replace"))
+                parts.append(line.rstrip(b"\n"))
+    if parts:
+        parts.append(b"")
+        sys.stdout.write(b"\n".join(parts).decode("utf-8", errors="replace"))
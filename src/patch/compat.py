@@ -7,6 +7,7 @@ Available under the terms of MIT license
 
 from __future__ import print_function
 
+import os
 import sys
 from typing import Union, TypeVar, Iterator
 
@@ -68,6 +69,7 @@ __all__ = [
     "PY3K",
     "compat_next",
     "tostr",
+    "fadvise_sequential",
 ]
 
 ByteLike = Union[bytes, bytearray, memoryview]
@@ -121,3 +123,24 @@ def tostr(b: StrOrByteLike) -> str:
         return _decode_utf8(bytes(b))
     # memoryview or other buffer-like object
     return _decode_utf8(bytes(b))
+
+
+def fadvise_sequential(fd: int) -> None:
+    """Hint the kernel that a file will be read sequentially.
+
+    Uses ``posix_fadvise(POSIX_FADV_SEQUENTIAL)`` where available, which
+    makes the kernel read ahead more aggressively. On platforms without
+    it (Windows, macOS) this is a no-op.
+
+    Args:
+        fd (int): File descriptor of a file opened for reading.
+
+    Note:
+        The hint is only advisory; errors from filesystems that reject it
+        are ignored.
+    """
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
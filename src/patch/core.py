@@ -8,15 +8,31 @@ Available under the terms of MIT license
 from __future__ import print_function
 
 import copy
+import logging
+import mmap
 import os
 import re
 import shutil
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
 from os.path import exists, isfile
-from typing import List, Optional, Union, Iterator, IO, Dict, TYPE_CHECKING
+from typing import (
+    Callable,
+    Dict,
+    Generator,
+    IO,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+    TYPE_CHECKING,
+)
 
 from .compat import tostr
 from .constants import MIXED
-from .logging_utils import debug, info, warning, debugmode
+from .logging_utils import debug, info, warning, logger
 from .utils import pathstrip
 from .parser import wrapumerate, detect_type, normalize_filenames
 
@@ -24,6 +40,65 @@ if TYPE_CHECKING:
     pass
 
 
+# regexp to match start of hunk, used groups - 1,3,4,6,7
+_RE_HUNK_HEAD = re.compile(rb"^@@ -(\d+)(,(\d+))? \+(\d+)(,(\d+))? @@(.*)")
+# valid first characters of hunk body lines
+_RE_BODY_LINE = re.compile(b"^[- \\+\\\\]")
+_RE_SOURCE_FILENAME = re.compile(b"^--- ([^\t]+)")
+_RE_TARGET_FILENAME = re.compile(rb"^\+\+\+ ([^\t]+)")
+
+# (log function, format, args) collected while validating files, formatted
+# lazily by the log function when apply() replays them
+_Messages = List[Tuple[Callable[..., None], str, Tuple[object, ...]]]
+
+# files smaller than this are read in one go, larger ones are mapped
+_MMAP_THRESHOLD = 64 * 1024
+
+
+def _iter_file_lines(filename: Union[str, bytes]) -> Generator[bytes, None, None]:
+    """Yield lines of a file, splitting on LF like binary file iteration.
+
+    Files of at least _MMAP_THRESHOLD bytes are read through mmap so the
+    kernel pages them in directly, with a sequential access hint where
+    available; smaller files are read with a single read() call, which is
+    cheaper than setting up a mapping and gains nothing from read-ahead.
+    """
+    with open(filename, "rb") as fh:
+        buf: Union[bytes, mmap.mmap]
+        if os.fstat(fh.fileno()).st_size < _MMAP_THRESHOLD:
+            buf = fh.read()
+        else:
+            buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                buf.madvise(mmap.MADV_SEQUENTIAL)
+        try:
+            find = buf.find
+            pos = 0
+            end = len(buf)
+            while pos < end:
+                nl = find(b"\n", pos)
+                nextpos = end if nl < 0 else nl + 1
+                yield buf[pos:nextpos]
+                pos = nextpos
+        finally:
+            if isinstance(buf, mmap.mmap):
+                buf.close()
+
+
+def _count_lineends(lines: List[bytes]) -> Tuple[int, int, int]:
+    """Return (lf, crlf, cr) line end counts for a list of lines.
+
+    LF and CRLF ends are counted on the joined buffer with bytes.count()
+    instead of testing each line. A CR inside a line is not a line end, so
+    bare CR ends are counted per line with a C-level map().
+    """
+    buf = b"".join(lines)
+    crlf = buf.count(b"\r\n")
+    lf = buf.count(b"\n") - crlf
+    cr = sum(map(bytes.endswith, lines, repeat(b"\r")))
+    return lf, crlf, cr
+
+
 class Hunk(object):
     """Parsed hunk data container representing a single diff hunk.
 
@@ -38,6 +113,10 @@ class Hunk(object):
         invalid (bool): True if hunk parsing failed or hunk is malformed.
         desc (bytes): Description text following the @@ line (usually function name).
         text (List[bytes]): Raw hunk content lines including +, -, and context lines.
+        src_lines (Optional[List[bytes]]): Context and removed lines without
+            prefixes and line ends, filled in by finalize().
+        tgt_lines (Optional[List[bytes]]): Context and added lines without
+            prefixes and line ends, filled in by finalize().
 
     Example:
         >>> hunk = Hunk()
@@ -48,6 +127,18 @@ class Hunk(object):
         >>> hunk.text = [b' context line', b'-removed line', b'+added line']
     """
 
+    __slots__ = (
+        "startsrc",
+        "linessrc",
+        "starttgt",
+        "linestgt",
+        "invalid",
+        "desc",
+        "text",
+        "src_lines",
+        "tgt_lines",
+    )
+
     def __init__(self) -> None:
         """Initialize a new Hunk object with default values."""
         self.startsrc: Optional[int] = None  #: line count starts with 1
@@ -57,6 +148,22 @@ class Hunk(object):
         self.invalid: bool = False
         self.desc: bytes = b""
         self.text: List[bytes] = []
+        self.src_lines: Optional[List[bytes]] = None
+        self.tgt_lines: Optional[List[bytes]] = None
+
+    def finalize(self) -> None:
+        """Precompute source and target line lists from hunk text.
+
+        Called once the hunk is fully parsed, so that apply() does not have
+        to rebuild the lists it compares against the file being patched.
+        Must be called again if text is modified afterwards.
+        """
+        self.src_lines = [
+            x[1:].rstrip(b"\r\n") for x in self.text if x[:1] in (b" ", b"-")
+        ]
+        self.tgt_lines = [
+            x[1:].rstrip(b"\r\n") for x in self.text if x[:1] in (b" ", b"+")
+        ]
 
 
 #  def apply(self, estream):
@@ -93,6 +200,8 @@ class Patch(object):
         ...     print(f"Hunk at line {hunk.startsrc}")
     """
 
+    __slots__ = ("source", "target", "hunks", "hunkends", "header", "type")
+
     def __init__(self) -> None:
         """Initialize a new Patch object with default values."""
         self.source: Optional[bytes] = None
@@ -214,14 +323,19 @@ class PatchSet(object):
         Note:
             This method automatically detects patch type and normalizes filenames.
             Mixed line endings are detected and warnings are issued.
+            Whether debug output is enabled is checked once on entry, so
+            setdebug() called while parsing takes effect on the next parse.
         """
-        lineends = dict(lf=0, crlf=0, cr=0)
+        debugmode = logger.isEnabledFor(logging.DEBUG)
         nexthunkno = 0  #: even if index starts with 0 user messages number hunks from 1
 
         p: Optional[Patch] = None
         hunk: Optional[Hunk] = None
-        # hunkactual variable is used to calculate hunk lines for comparison
-        hunkactual = dict(linessrc=0, linestgt=0)
+        # actual hunk line counts, compared against the @@ header
+        hunk_src_actual = 0
+        hunk_tgt_actual = 0
+        # line end stats for the current patch, flushed to p.hunkends
+        ends_lf = ends_crlf = ends_cr = 0
 
         # define states (possible file regions) that direct parse flow
         headscan = True  # start with scanning header
@@ -233,27 +347,43 @@ class PatchSet(object):
 
         hunkparsed = False  # state after successfully parsed hunk
 
-        # regexp to match start of hunk, used groups - 1,3,4,6
-        re_hunk_start = re.compile(rb"^@@ -(\d+)(,(\d+))? \+(\d+)(,(\d+))? @@")
+        # bind regexp matchers and bytes methods to locals for the main loop
+        match_hunk_head = _RE_HUNK_HEAD.match
+        match_body_line = _RE_BODY_LINE.match
+        match_source_filename = _RE_SOURCE_FILENAME.match
+        match_target_filename = _RE_TARGET_FILENAME.match
+        startswith = bytes.startswith
+        # identical context lines (blank, closing braces, ...) share one object
+        _pool: Dict[bytes, bytes] = {}
+        intern_context = _pool.setdefault
 
         self.errors = 0
+        # errors and warnings are counted locally and added to self at the end
+        nerrors = 0
+        nwarnings = 0
+        # hunk header match found by a decider, reused by hunkhead block
+        hunkmatch = None
         # temp buffers for header and filenames info
         header: List[bytes] = []
+        headersize = 0  # size of header in bytes, kept to avoid joining it
         srcname: Optional[bytes] = None
         tgtname: Optional[bytes] = None
 
         # start of main cycle
         # each parsing block already has line available in fe.line
         fe = wrapumerate(stream)
-        while fe.next():
+        fenext = fe.next
+        while fenext():
 
             # -- deciders: these only switch state to decide who should process
             # --           line fetched at the start of this cycle
             if hunkparsed:
                 hunkparsed = False
-                if isinstance(fe.line, bytes) and re_hunk_start.match(fe.line):
+                if isinstance(fe.line, bytes):
+                    hunkmatch = match_hunk_head(fe.line)
+                if hunkmatch:
                     hunkhead = True
-                elif isinstance(fe.line, bytes) and fe.line.startswith(b"--- "):
+                elif isinstance(fe.line, bytes) and startswith(fe.line, b"--- "):
                     filenames = True
                 else:
                     headscan = True
@@ -262,21 +392,22 @@ class PatchSet(object):
             # read out header
             if headscan:
                 while not fe.is_empty and not (
-                    isinstance(fe.line, bytes) and fe.line.startswith(b"--- ")
+                    isinstance(fe.line, bytes) and startswith(fe.line, b"--- ")
                 ):
                     if isinstance(fe.line, bytes):
                         header.append(fe.line)
-                    fe.next()
+                        headersize += len(fe.line)
+                    fenext()
                 if fe.is_empty:
                     if p is None:
                         debug("no patch data found")  # error is shown later
-                        self.errors += 1
+                        nerrors += 1
                     else:
                         info(
                             "%d unparsed bytes left at the end of stream"
-                            % len(b"".join(header))
+                            % headersize
                         )
-                        self.warnings += 1
+                        nwarnings += 1
                         # TODO check for \No new line at the end..
                         # TODO test for unparsed bytes
                         # otherwise error += 1
@@ -299,29 +430,22 @@ class PatchSet(object):
                 # [x] treat empty lines inside hunks as containing single space
                 #     (this happens when diff is saved by copy/pasting to editor
                 #      that strips trailing whitespace)
-                if line.strip(b"\r\n") == b"":
+                # strip() only runs for lines that start with a line end
+                if line[:1] in (b"", b"\n", b"\r") and line.strip(b"\r\n") == b"":
                     debug("expanding empty line in a middle of hunk body")
-                    self.warnings += 1
+                    nwarnings += 1
                     line = b" " + line
 
                 # process line first
-                if re.match(b"^[- \\+\\\\]", line):
-                    # gather stats about line endings
-                    if p is not None:
-                        if line.endswith(b"\r\n"):
-                            p.hunkends["crlf"] += 1
-                        elif line.endswith(b"\n"):
-                            p.hunkends["lf"] += 1
-                        elif line.endswith(b"\r"):
-                            p.hunkends["cr"] += 1
-
-                    if line.startswith(b"-"):
-                        hunkactual["linessrc"] += 1
-                    elif line.startswith(b"+"):
-                        hunkactual["linestgt"] += 1
-                    elif not line.startswith(b"\\"):
-                        hunkactual["linessrc"] += 1
-                        hunkactual["linestgt"] += 1
+                if match_body_line(line):
+                    if startswith(line, b"-"):
+                        hunk_src_actual += 1
+                    elif startswith(line, b"+"):
+                        hunk_tgt_actual += 1
+                    elif not startswith(line, b"\\"):
+                        hunk_src_actual += 1
+                        hunk_tgt_actual += 1
+                        line = intern_context(line, line)
                     if hunk is not None:
                         hunk.text.append(line)
                     # todo: handle \ No newline cases
@@ -334,22 +458,27 @@ class PatchSet(object):
                     # add hunk status node
                     if hunk is not None:
                         hunk.invalid = True
+                        lf, crlf, cr = _count_lineends(hunk.text)
+                        ends_lf += lf
+                        ends_crlf += crlf
+                        ends_cr += cr
                     if p is not None and hunk is not None:
                         p.hunks.append(hunk)
-                    self.errors += 1
+                    nerrors += 1
                     # switch to hunkskip state
                     hunkbody = False
                     hunkskip = True
 
                 # check exit conditions
                 if (
-                    hunk is not None
+                    hunkbody
+                    and hunk is not None
                     and hunk.linessrc is not None
                     and hunk.linestgt is not None
                 ):
                     if (
-                        hunkactual["linessrc"] > hunk.linessrc
-                        or hunkactual["linestgt"] > hunk.linestgt
+                        hunk_src_actual > hunk.linessrc
+                        or hunk_tgt_actual > hunk.linestgt
                     ):
                         if p is not None and p.target is not None:
                             warning(
@@ -358,17 +487,26 @@ class PatchSet(object):
                             )
                         # add hunk status node
                         hunk.invalid = True
+                        lf, crlf, cr = _count_lineends(hunk.text)
+                        ends_lf += lf
+                        ends_crlf += crlf
+                        ends_cr += cr
                         if p is not None:
                             p.hunks.append(hunk)
-                        self.errors += 1
+                        nerrors += 1
                         # switch to hunkskip state
                         hunkbody = False
                         hunkskip = True
                     elif (
-                        hunk.linessrc == hunkactual["linessrc"]
-                        and hunk.linestgt == hunkactual["linestgt"]
+                        hunk.linessrc == hunk_src_actual
+                        and hunk.linestgt == hunk_tgt_actual
                     ):
                         # hunk parsed successfully
+                        hunk.finalize()
+                        lf, crlf, cr = _count_lineends(hunk.text)
+                        ends_lf += lf
+                        ends_crlf += crlf
+                        ends_cr += cr
                         if p is not None:
                             p.hunks.append(hunk)
                         # switch to hunkparsed state
@@ -377,7 +515,9 @@ class PatchSet(object):
 
                         # detect mixed window/unix line ends
                         if p is not None:
-                            ends = p.hunkends
+                            ends = p.hunkends = dict(
+                                lf=ends_lf, crlf=ends_crlf, cr=ends_cr
+                            )
                             if (
                                 (ends["cr"] != 0)
                                 + (ends["crlf"] != 0)
@@ -388,7 +528,7 @@ class PatchSet(object):
                                         "inconsistent line ends in patch hunks for %r"
                                         % p.source
                                     )
-                                self.warnings += 1
+                                nwarnings += 1
                             if debugmode:
                                 debuglines: Dict[str,
                                                  Union[str, int]] = dict(ends)
@@ -407,11 +547,12 @@ class PatchSet(object):
                         continue
 
             if hunkskip:
-                if re_hunk_start.match(line):
+                hunkmatch = match_hunk_head(line)
+                if hunkmatch:
                     # switch to hunkhead state
                     hunkskip = False
                     hunkhead = True
-                elif line.startswith(b"--- "):
+                elif startswith(line, b"--- "):
                     # switch to filenames state
                     hunkskip = False
                     filenames = True
@@ -421,7 +562,7 @@ class PatchSet(object):
                                   (len(p.hunks), p.source))
 
             if filenames:
-                if line.startswith(b"--- "):
+                if startswith(line, b"--- "):
                     if srcname is not None:
                         # XXX testcase
                         warning("skipping false patch for %r" % srcname)
@@ -429,25 +570,24 @@ class PatchSet(object):
                         # XXX header += srcname
                         # double source filename line is encountered
                         # attempt to restart from this second line
-                    re_filename = b"^--- ([^\t]+)"
-                    match = re.match(re_filename, line)
+                    match = match_source_filename(line)
                     # todo: support spaces in filenames
                     if match:
                         srcname = match.group(1).strip()
                     else:
                         warning("skipping invalid filename at line %d" %
                                 (lineno + 1))
-                        self.errors += 1
+                        nerrors += 1
                         # XXX p.header += line
                         # switch back to headscan state
                         filenames = False
                         headscan = True
-                elif not line.startswith(b"+++ "):
+                elif not startswith(line, b"+++ "):
                     if srcname is not None:
                         warning(
                             "skipping invalid patch with no target for %r" % srcname
                         )
-                        self.errors += 1
+                        nerrors += 1
                         srcname = None
                         # XXX header += srcname
                         # XXX header += line
@@ -463,7 +603,7 @@ class PatchSet(object):
                             "skipping invalid patch - double target at line %d"
                             % (lineno + 1)
                         )
-                        self.errors += 1
+                        nerrors += 1
                         srcname = None
                         tgtname = None
                         # XXX header += srcname
@@ -474,20 +614,22 @@ class PatchSet(object):
                         filenames = False
                         headscan = True
                     else:
-                        re_filename = rb"^\+\+\+ ([^\t]+)"
-                        match = re.match(re_filename, line)
+                        match = match_target_filename(line)
                         if not match:
                             warning(
                                 "skipping invalid patch - no target filename at line %d"
                                 % (lineno + 1)
                             )
-                            self.errors += 1
+                            nerrors += 1
                             srcname = None
                             # switch back to headscan state
                             filenames = False
                             headscan = True
                         else:
                             if p:  # for the first run p is None
+                                p.hunkends = dict(
+                                    lf=ends_lf, crlf=ends_crlf, cr=ends_cr
+                                )
                                 self.items.append(p)
                             p = Patch()
                             p.source = srcname
@@ -495,16 +637,18 @@ class PatchSet(object):
                             p.target = match.group(1).strip()
                             p.header = header
                             header = []
+                            headersize = 0
                             # switch to hunkhead state
                             filenames = False
                             hunkhead = True
                             nexthunkno = 0
-                            p.hunkends = lineends.copy()
+                            ends_lf = ends_crlf = ends_cr = 0
+                            p.hunkends = dict(lf=0, crlf=0, cr=0)
                             continue
 
             if hunkhead:
-                match = re.match(
-                    rb"^@@ -(\d+)(,(\d+))? \+(\d+)(,(\d+))? @@(.*)", line)
+                match = hunkmatch or match_hunk_head(line)
+                hunkmatch = None
                 if not match:
                     if p is not None and not p.hunks:
                         if p.source is not None:
@@ -512,7 +656,7 @@ class PatchSet(object):
                                 "skipping invalid patch with no hunks for file %r"
                                 % p.source
                             )
-                        self.errors += 1
+                        nerrors += 1
                         # XXX review switch
                         # switch to headscan state
                         hunkhead = False
@@ -537,7 +681,7 @@ class PatchSet(object):
                     hunk.desc = match.group(7)[1:].rstrip()
                     hunk.text = []
 
-                    hunkactual["linessrc"] = hunkactual["linestgt"] = 0
+                    hunk_src_actual = hunk_tgt_actual = 0
 
                     # switch to hunkbody state
                     hunkhead = False
@@ -547,7 +691,18 @@ class PatchSet(object):
 
         # /while fe.next()
 
+        self.errors += nerrors
+        self.warnings += nwarnings
+
+        if hunkbody and hunk is not None:
+            # stream ended in the middle of a hunk
+            lf, crlf, cr = _count_lineends(hunk.text)
+            ends_lf += lf
+            ends_crlf += crlf
+            ends_cr += cr
+
         if p:
+            p.hunkends = dict(lf=ends_lf, crlf=ends_crlf, cr=ends_cr)
             self.items.append(p)
 
         if not hunkparsed:
@@ -782,6 +937,8 @@ class PatchSet(object):
                 warning("error: strip parameter '%s' must be an integer" % strip)
                 strip = 0
 
+        # resolve files to patch
+        targets: List[Tuple[int, Patch, bytes]] = []
         # for fileno, filename in enumerate(self.source):
         for i, p in enumerate(self.items):
             if strip:
@@ -816,131 +973,197 @@ class PatchSet(object):
                 errors += 1
                 continue
 
-            # [ ] check absolute paths security here
-            debug("processing %d/%d:\t %r" % (i + 1, total, filename))
-
-            # validate before patching
-            f2fp = open(filename, "rb")
-            hunkno = 0
-            hunk = p.hunks[hunkno]
-            hunkfind: List[bytes] = []
-            validhunks = 0
-            canpatch = False
-            hunklineno = 0
-            for lineno, line in enumerate(f2fp):
-                if hunk.startsrc is not None and lineno + 1 < hunk.startsrc:
-                    continue
-                elif hunk.startsrc is not None and lineno + 1 == hunk.startsrc:
-                    hunkfind = [
-                        x[1:].rstrip(b"\r\n") for x in hunk.text if x[0:1] in b" -"
-                    ]
-                    hunklineno = 0
+            targets.append((i, p, filename))
+
+        # validation only reads files, so it is run concurrently to overlap
+        # I/O latency; patching itself mutates files and stays serial.
+        # Several entries for the same file must see each other's changes,
+        # so in that case every entry is validated right before its write.
+        filenames = [filename for _, _, filename in targets]
+        if len(targets) > 1 and len(set(filenames)) == len(filenames):
+            workers = min(32, (os.cpu_count() or 1) * 4, len(targets))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results: Iterable[Tuple[bool, int, _Messages]] = list(
+                    executor.map(
+                        lambda t: self._validate(t[0], total, t[1], t[2]), targets
+                    )
+                )
+        else:
+            results = (self._validate(i, total, p, f) for i, p, f in targets)
 
-                    # todo \ No newline at end of file
+        for (i, p, filename), (canpatch, verrors, messages) in zip(targets, results):
+            # replay diagnostics in file order
+            for log, fmt, args in messages:
+                log(fmt, *args)
+            errors += verrors
+            if canpatch:
+                errors += self._write(i, total, p, filename)
 
-                # check hunks in source file
-                if (
-                    hunk.startsrc is not None
-                    and lineno + 1 < hunk.startsrc + len(hunkfind) - 1
-                ):
-                    if line.rstrip(b"\r\n") == hunkfind[hunklineno]:
-                        hunklineno += 1
-                    else:
-                        info("file %d/%d:\t %r" % (i + 1, total, filename))
-                        info(
-                            " hunk no.%d doesn't match source file at line %d"
-                            % (hunkno + 1, lineno + 1)
-                        )
-                        info("  expected: %r" % hunkfind[hunklineno])
-                        info("  actual  : %r" % line.rstrip(b"\r\n"))
-                        # not counting this as error, because file may already be patched.
-                        # check if file is already patched is done after the number of
-                        # invalid hunks if found
-                        # TODO: check hunks against source/target file in one pass
-                        #   API - check(stream, srchunks, tgthunks)
-                        #           return tuple (srcerrs, tgterrs)
-
-                        # continue to check other hunks for completeness
-                        hunkno += 1
-                        if hunkno < len(p.hunks):
-                            hunk = p.hunks[hunkno]
-                            continue
-                        else:
-                            break
+        if prevdir is not None:
+            os.chdir(prevdir)
 
-                # check if processed line is the last line
-                if (
-                    hunk.startsrc is not None
-                    and lineno + 1 == hunk.startsrc + len(hunkfind) - 1
-                ):
-                    debug(
-                        " hunk no.%d for file %r  -- is ready to be patched"
-                        % (hunkno + 1, filename)
+        # todo: check for premature eof
+        return errors == 0
+
+    def _validate(
+        self, i: int, total: int, p: Patch, filename: bytes
+    ) -> Tuple[bool, int, _Messages]:
+        """Check hunks of a patch against the file they are applied to.
+
+        Only reads the file, so it is safe to run for several files at once.
+        Log messages are collected instead of emitted, so that apply() can
+        replay them in file order.
+
+        Returns:
+            Tuple[bool, int, List]: Whether the file can be patched, the
+                number of errors found and the collected (log, format, args)
+                tuples.
+        """
+        messages: _Messages = []
+        errors = 0
+
+        # [ ] check absolute paths security here
+        messages.append((debug, "processing %d/%d:\t %r", (i + 1, total, filename)))
+
+        # validate before patching
+        f2lines = _iter_file_lines(filename)
+        hunkno = 0
+        hunk = p.hunks[hunkno]
+        hunkfind: List[bytes] = []
+        validhunks = 0
+        canpatch = False
+        hunklineno = 0
+        for lineno, line in enumerate(f2lines):
+            if hunk.startsrc is not None and lineno + 1 < hunk.startsrc:
+                continue
+            elif hunk.startsrc is not None and lineno + 1 == hunk.startsrc:
+                if hunk.src_lines is None:
+                    hunk.finalize()
+                hunkfind = hunk.src_lines or []
+                hunklineno = 0
+
+                # todo \ No newline at end of file
+
+            # check hunks in source file
+            if (
+                hunk.startsrc is not None
+                and lineno + 1 < hunk.startsrc + len(hunkfind) - 1
+            ):
+                if line.rstrip(b"\r\n") == hunkfind[hunklineno]:
+                    hunklineno += 1
+                else:
+                    messages.append(
+                        (info, "file %d/%d:\t %r", (i + 1, total, filename))
+                    )
+                    messages.append(
+                        (
+                            info,
+                            " hunk no.%d doesn't match source file at line %d",
+                            (hunkno + 1, lineno + 1),
+                        )
                     )
+                    messages.append(
+                        (info, "  expected: %r", (hunkfind[hunklineno],))
+                    )
+                    messages.append(
+                        (info, "  actual  : %r", (line.rstrip(b"\r\n"),))
+                    )
+                    # not counting this as error, because file may already be patched.
+                    # check if file is already patched is done after the number of
+                    # invalid hunks if found
+                    # TODO: check hunks against source/target file in one pass
+                    #   API - check(stream, srchunks, tgthunks)
+                    #           return tuple (srcerrs, tgterrs)
+
+                    # continue to check other hunks for completeness
                     hunkno += 1
-                    validhunks += 1
                     if hunkno < len(p.hunks):
                         hunk = p.hunks[hunkno]
+                        continue
                     else:
-                        if validhunks == len(p.hunks):
-                            # patch file
-                            canpatch = True
-                            break
-            else:
+                        break
+
+            # check if processed line is the last line
+            if (
+                hunk.startsrc is not None
+                and lineno + 1 == hunk.startsrc + len(hunkfind) - 1
+            ):
+                messages.append(
+                    (
+                        debug,
+                        " hunk no.%d for file %r  -- is ready to be patched",
+                        (hunkno + 1, filename),
+                    )
+                )
+                hunkno += 1
+                validhunks += 1
                 if hunkno < len(p.hunks):
-                    warning(
-                        "premature end of source file %r at hunk %d"
-                        % (filename, hunkno + 1)
+                    hunk = p.hunks[hunkno]
+                else:
+                    if validhunks == len(p.hunks):
+                        # patch file
+                        canpatch = True
+                        break
+        else:
+            if hunkno < len(p.hunks):
+                messages.append(
+                    (
+                        warning,
+                        "premature end of source file %r at hunk %d",
+                        (filename, hunkno + 1),
                     )
-                    errors += 1
+                )
+                errors += 1
 
-            f2fp.close()
+        f2lines.close()
 
-            if validhunks < len(p.hunks):
-                if self._match_file_hunks(filename, p.hunks):
-                    warning("already patched  %r" % filename)
-                else:
-                    warning("source file is different - %r" % filename)
-                    errors += 1
-            if canpatch:
-                backupname = filename + b".orig"
-                if exists(backupname.decode("utf-8", errors="replace")):
-                    warning("can't backup original file to %r - aborting" %
-                            backupname)
-                else:
-                    shutil.move(
-                        filename.decode("utf-8", errors="replace"),
-                        backupname.decode("utf-8", errors="replace"),
-                    )
-                    if self.write_hunks(backupname, filename, p.hunks):
-                        info(
-                            "successfully patched %d/%d:\t %r"
-                            % (i + 1, total, filename)
-                        )
-                        os.unlink(backupname.decode("utf-8", errors="replace"))
-                    else:
-                        errors += 1
-                        warning("error patching file %r" % filename)
-                        shutil.copy(
-                            filename.decode("utf-8", errors="replace"),
-                            filename.decode(
-                                "utf-8", errors="replace") + ".invalid",
-                        )
-                        warning(
-                            "invalid version is saved to %r" % (
-                                filename + b".invalid")
-                        )
-                        # todo: proper rejects
-                        shutil.move(
-                            backupname.decode("utf-8", errors="replace"),
-                            filename.decode("utf-8", errors="replace"),
-                        )
+        if validhunks < len(p.hunks):
+            if self._match_file_hunks(filename, p.hunks):
+                messages.append((warning, "already patched  %r", (filename,)))
+            else:
+                messages.append(
+                    (warning, "source file is different - %r", (filename,))
+                )
+                errors += 1
 
-        if prevdir is not None:
-            os.chdir(prevdir)
+        return canpatch, errors, messages
 
-        # todo: check for premature eof
-        return errors == 0
+    def _write(self, i: int, total: int, p: Patch, filename: bytes) -> int:
+        """Back up the file, write patched content and return error count."""
+        errors = 0
+        backupname = filename + b".orig"
+        if exists(backupname.decode("utf-8", errors="replace")):
+            warning("can't backup original file to %r - aborting" %
+                    backupname)
+        else:
+            shutil.move(
+                filename.decode("utf-8", errors="replace"),
+                backupname.decode("utf-8", errors="replace"),
+            )
+            if self.write_hunks(backupname, filename, p.hunks):
+                info(
+                    "successfully patched %d/%d:\t %r"
+                    % (i + 1, total, filename)
+                )
+                os.unlink(backupname.decode("utf-8", errors="replace"))
+            else:
+                errors += 1
+                warning("error patching file %r" % filename)
+                shutil.copy(
+                    filename.decode("utf-8", errors="replace"),
+                    filename.decode(
+                        "utf-8", errors="replace") + ".invalid",
+                )
+                warning(
+                    "invalid version is saved to %r" % (
+                        filename + b".invalid")
+                )
+                # todo: proper rejects
+                shutil.move(
+                    backupname.decode("utf-8", errors="replace"),
+                    filename.decode("utf-8", errors="replace"),
+                )
+        return errors
 
     def revert(self, strip: Union[int, str] = 0, root: Optional[str] = None) -> bool:
         """Revert patches by applying them in reverse.
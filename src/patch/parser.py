@@ -5,17 +5,44 @@ Copyright (c) 2008-2016 anatoly techtonik
 Available under the terms of MIT license
 """
 
-import re
+import logging
 from typing import Union, TYPE_CHECKING, Iterator
 
-from .compat import compat_next
 from .constants import PLAIN, GIT, HG, SVN
-from .logging_utils import debug, warning, debugmode
+from .logging_utils import debug, warning, logger
 from .utils import xisabs, xnormpath, xstrip
 
 if TYPE_CHECKING:
     from .core import Patch, PatchSet
 
+# filename used by diff tools for created and deleted files
+_DEV_NULL = b"/dev/null"
+
+
+def _isword(s: bytes) -> bool:
+    """Return True if s is non-empty and matches \\w+ in a bytes regexp."""
+    # bytes.isalnum() is ASCII-only, like \w for bytes patterns
+    return s.replace(b"_", b"0").isalnum()
+
+
+def _is_git_index(line: bytes) -> bool:
+    """Check for Git "index <hash>..<hash> <mode>" header line."""
+    if not line.startswith(b"index "):
+        return False
+    hashes, sep, mode = line[6:].partition(b" ")
+    if not sep or not mode[:1].isdigit():
+        return False
+    old, dots, new = hashes.partition(b"..")
+    return bool(dots) and _isword(old) and _isword(new)
+
+
+def _is_hg_diff(line: bytes) -> bool:
+    """Check for plain Mercurial "diff -r <rev> <filename>" header line."""
+    if not line.startswith(b"diff -r "):
+        return False
+    rev, sep, _ = line[8:].partition(b" ")
+    return bool(sep) and _isword(rev)
+
 
 class wrapumerate(object):
     """Enumerate wrapper for stream parsing with boolean end-of-stream status.
@@ -40,6 +67,8 @@ class wrapumerate(object):
         Line 2: b'line3\\n'
     """
 
+    __slots__ = ("_stream", "is_empty", "line", "lineno")
+
     def __init__(self, stream: Iterator[bytes]) -> None:
         """Initialize the wrapper with a byte stream.
 
@@ -47,11 +76,11 @@ class wrapumerate(object):
             stream (Iterator[bytes]): Iterable byte stream to wrap.
         """
         self._stream = enumerate(stream)
-        self._exhausted = False
+        self.is_empty = False
         # after end of stream equal to the num of lines
-        self._lineno: Union[int, bool] = False
+        self.lineno: Union[int, bool] = False
         # will be reset to False after end of stream
-        self._line: Union[bytes, bool] = False
+        self.line: Union[bytes, bool] = False
 
     def next(self) -> bool:
         """Try to read the next line and return True if it is available.
@@ -64,44 +93,17 @@ class wrapumerate(object):
             >>> if wrapper.next():
             ...     print(f"Got line: {wrapper.line}")
         """
-        if self._exhausted:
+        if self.is_empty:
             return False
 
         try:
-            self._lineno, self._line = compat_next(self._stream)
+            self.lineno, self.line = next(self._stream)
         except StopIteration:
-            self._exhausted = True
-            self._line = False
+            self.is_empty = True
+            self.line = False
             return False
         return True
 
-    @property
-    def is_empty(self) -> bool:
-        """Check if the stream has been exhausted.
-
-        Returns:
-            bool: True if no more lines are available.
-        """
-        return self._exhausted
-
-    @property
-    def line(self) -> Union[bytes, bool]:
-        """Get the current line content.
-
-        Returns:
-            Union[bytes, bool]: Current line as bytes, or False if exhausted.
-        """
-        return self._line
-
-    @property
-    def lineno(self) -> Union[int, bool]:
-        """Get the current line number.
-
-        Returns:
-            Union[int, bool]: Current line number (0-based), or False if exhausted.
-        """
-        return self._lineno
-
 
 def detect_type(p: "Patch") -> str:
     """Detect and return the patch format type for the specified Patch object.
@@ -132,24 +134,34 @@ def detect_type(p: "Patch") -> str:
         relies on the original a/ and b/ prefixes for detection.
     """
 
+    header = p.header
+    hlen = len(header)
+    last = header[-1] if hlen > 0 else b""
+    prev = header[-2] if hlen > 1 else b""
+    source = p.source
+    target = p.target
+
     # check for SVN
     #  - header starts with Index:
     #  - next line is ===... delimiter
     #  - filename is followed by revision number
     # TODO add SVN revision
     if (
-        len(p.header) > 1
-        and p.header[-2].startswith(b"Index: ")
-        and p.header[-1].startswith(b"=" * 67)
+        hlen > 1
+        and prev[:7] == b"Index: "
+        and last.startswith(b"=" * 67)
     ):
         return SVN
 
     # common checks for both HG and GIT - need to check for None first
     DVCS = False
-    if p.source is not None and p.target is not None:
-        DVCS = (p.source.startswith(b"a/") or p.source == b"/dev/null") and (
-            p.target.startswith(b"b/") or p.target == b"/dev/null"
+    if source is not None and target is not None:
+        DVCS = (source[:2] == b"a/" or source == _DEV_NULL) and (
+            target[:2] == b"b/" or target == _DEV_NULL
         )
+    if not DVCS:
+        # GIT and HG checks below all require a/ and b/ style filenames
+        return PLAIN
 
     # GIT type check
     #  - header[-2] is like "diff --git a/oldname b/newname"
@@ -159,19 +171,17 @@ def detect_type(p: "Patch") -> str:
     # TODO http://www.kernel.org/pub/software/scm/git/docs/git-diff.html
 
     # Git patch header detection
-    idx = -1  # Initialize idx
-    if len(p.header) > 1:
+    if hlen > 1:
         # detect the start of diff header - there might be some comments before
-        for idx in reversed(range(len(p.header))):
-            if p.header[idx].startswith(b"diff --git"):
+        idx = -1
+        for i in range(hlen - 1, -1, -1):
+            if header[i][:10] == b"diff --git":
+                idx = i
                 break
-        if idx >= 0 and p.header[idx].startswith(b"diff --git a/"):
+        if idx >= 0 and header[idx][:13] == b"diff --git a/":
             # Check if there's an index line (typical for Git)
-            if idx + 1 < len(p.header) and re.match(
-                b"index \\w+\\.\\.\\w+ \\d+", p.header[idx + 1]
-            ):
-                if DVCS:
-                    return GIT
+            if idx + 1 < hlen and _is_git_index(header[idx + 1]):
+                return GIT
 
     # HG check
     #
@@ -184,14 +194,14 @@ def detect_type(p: "Patch") -> str:
     #    ...
     # TODO add MQ
     # TODO add revision info
-    if len(p.header) > 0:
-        if DVCS and re.match(b"diff -r \\w+ .*", p.header[-1]):
+    if hlen > 0:
+        if _is_hg_diff(last):
             return HG
         # Check for HG changeset patch marker or Git-style HG patches
-        if DVCS and p.header[-1].startswith(b"diff --git a/"):
-            if len(p.header) == 1:  # Git-style HG patch has only one header line
+        if last[:13] == b"diff --git a/":
+            if hlen == 1:  # Git-style HG patch has only one header line
                 return HG
-            elif p.header[0].startswith(b"# HG changeset patch"):
+            elif header[0].startswith(b"# HG changeset patch"):
                 return HG
 
     return PLAIN
@@ -230,75 +240,95 @@ def normalize_filenames(patchset: "PatchSet") -> None:
         Issues warnings for any suspicious path patterns and increments
         the patchset's warning counter.
     """
-    if debugmode:
+    items = patchset.items
+    warnings = 0
+    if logger.isEnabledFor(logging.DEBUG):
         debug("normalize filenames")
-    for i, p in enumerate(patchset.items):
-        if debugmode:
+        for i, p in enumerate(items):
             debug("    patch type = %s" % (p.type or "None"))
             debug("    source = %r" % p.source)
             debug("    target = %r" % p.target)
-        if p.type in (HG, GIT):
-            # TODO: figure out how to deal with /dev/null entries
-            debug("stripping a/ and b/ prefixes")
-            if p.source != b"/dev/null" and p.source is not None:
-                if not p.source.startswith(b"a/"):
-                    warning("invalid source filename")
-                    patchset.warnings += 1
-                else:
-                    p.source = p.source[2:]
-            if p.target != b"/dev/null" and p.target is not None:
-                if not p.target.startswith(b"b/"):
-                    warning("invalid target filename")
-                    patchset.warnings += 1
-                else:
-                    p.target = p.target[2:]
-
-        # Only normalize if not None
-        if p.source is not None:
-            p.source = xnormpath(p.source)
-        if p.target is not None:
-            p.target = xnormpath(p.target)
-
-        sep = b"/"  # sep value can be hardcoded, but it looks nice this way
-
-        # references to parent are not allowed
-        if p.source is not None and p.source.startswith(b".." + sep):
-            warning(
-                "error: stripping parent path for source file patch no.%d" % (
-                    i + 1)
-            )
-            patchset.warnings += 1
-            while p.source.startswith(b".." + sep):
-                p.source = p.source.partition(sep)[2]
-        if p.target is not None and p.target.startswith(b".." + sep):
-            warning(
-                "error: stripping parent path for target file patch no.%d" % (
-                    i + 1)
-            )
-            patchset.warnings += 1
-            while p.target.startswith(b".." + sep):
-                p.target = p.target.partition(sep)[2]
-        # absolute paths are not allowed (except /dev/null)
-        source_is_abs = (
-            p.source is not None and xisabs(
-                p.source) and p.source != b"/dev/null"
+            warnings += _normalize_patch(i, p)
+    else:
+        for i, p in enumerate(items):
+            warnings += _normalize_patch(i, p)
+    patchset.warnings += warnings
+
+
+def _normalize_patch(i: int, p: "Patch") -> int:
+    """Normalize filenames of patch number i, see normalize_filenames().
+
+    Returns:
+        int: Number of warnings issued for this patch.
+    """
+    warnings = 0
+    if p.type in (HG, GIT):
+        # TODO: figure out how to deal with /dev/null entries
+        debug("stripping a/ and b/ prefixes")
+        if p.source != _DEV_NULL and p.source is not None:
+            stripped = p.source.removeprefix(b"a/")
+            if len(stripped) == len(p.source):
+                warning("invalid source filename")
+                warnings += 1
+            else:
+                p.source = stripped
+        if p.target != _DEV_NULL and p.target is not None:
+            stripped = p.target.removeprefix(b"b/")
+            if len(stripped) == len(p.target):
+                warning("invalid target filename")
+                warnings += 1
+            else:
+                p.target = stripped
+
+    # Only normalize if not None
+    if p.source is not None:
+        p.source = xnormpath(p.source)
+    if p.target is not None:
+        p.target = xnormpath(p.target)
+
+    sep = b"/"  # sep value can be hardcoded, but it looks nice this way
+
+    # references to parent are not allowed
+    if p.source is not None and p.source.startswith(b".." + sep):
+        warning(
+            "error: stripping parent path for source file patch no.%d" % (
+                i + 1)
         )
-        target_is_abs = (
-            p.target is not None and xisabs(
-                p.target) and p.target != b"/dev/null"
+        warnings += 1
+        pos = 0
+        while p.source.startswith(b".." + sep, pos):
+            pos += 3
+        p.source = p.source[pos:]
+    if p.target is not None and p.target.startswith(b".." + sep):
+        warning(
+            "error: stripping parent path for target file patch no.%d" % (
+                i + 1)
         )
-
-        if source_is_abs or target_is_abs:
-            warning("error: absolute paths are not allowed - file no.%d" % (i + 1))
-            patchset.warnings += 1
-            if source_is_abs and p.source is not None:
-                warning("stripping absolute path from source name %r" %
-                        p.source)
-                p.source = xstrip(p.source)
-            if target_is_abs and p.target is not None:
-                warning("stripping absolute path from target name %r" %
-                        p.target)
-                p.target = xstrip(p.target)
-
-        patchset.items[i].source = p.source
-        patchset.items[i].target = p.target
+        warnings += 1
+        pos = 0
+        while p.target.startswith(b".." + sep, pos):
+            pos += 3
+        p.target = p.target[pos:]
+    # absolute paths are not allowed (except /dev/null)
+    source_is_abs = (
+        p.source is not None and xisabs(
+            p.source) and p.source != _DEV_NULL
+    )
+    target_is_abs = (
+        p.target is not None and xisabs(
+            p.target) and p.target != _DEV_NULL
+    )
+
+    if source_is_abs or target_is_abs:
+        warning("error: absolute paths are not allowed - file no.%d" % (i + 1))
+        warnings += 1
+        if source_is_abs and p.source is not None:
+            warning("stripping absolute path from source name %r" %
+                    p.source)
+            p.source = xstrip(p.source)
+        if target_is_abs and p.target is not None:
+            warning("stripping absolute path from target name %r" %
+                    p.target)
+            p.target = xstrip(p.target)
+
+    return warnings
@@ -5,11 +5,12 @@ Copyright (c) 2008-2016 anatoly techtonik
 Available under the terms of MIT license
 """
 
-import os
 import posixpath
-import re
 
 
+# maps Windows backslashes to forward slashes in a single pass
+_SLASH_TRANS = bytes.maketrans(b"\\", b"/")
+
 # x...() function are used to work with paths in
 # cross-platform manner - all paths use forward
 # slashes even on Windows.
@@ -41,12 +42,14 @@ def xisabs(filename: bytes) -> bool:
         This function is used to detect absolute paths in patches,
         which are typically not allowed for security reasons.
     """
-    if filename.startswith(b"/"):  # Linux/Unix
-        return True
-    elif filename.startswith(b"\\"):  # Windows
+    first = filename[:1]
+    if first == b"/":  # Linux/Unix
         return True
-    elif re.match(b"\\w:[\\\\/]", filename):  # Windows
+    elif first == b"\\":  # Windows
         return True
+    elif filename[1:2] == b":" and filename[2:3] in (b"\\", b"/"):  # Windows
+        # drive letter is a single word character, like \w in regexps
+        return first.isalnum() or first == b"_"
     return False
 
 
@@ -74,10 +77,12 @@ def xnormpath(path: bytes) -> bytes:
         This function ensures all paths use forward slashes, making
         patches portable between Unix and Windows systems.
     """
-    # replace escapes and Windows slashes
-    normalized = posixpath.normpath(path).replace(b"\\", b"/")
-    # fold the result
-    return posixpath.normpath(normalized)
+    if b"\\" not in path:
+        # no Windows slashes - a single pass is enough
+        return posixpath.normpath(path)
+    # replace Windows slashes before folding, so that mixed separators
+    # are split into components correctly
+    return posixpath.normpath(path.translate(_SLASH_TRANS))
 
 
 def xstrip(filename: bytes) -> bytes:
@@ -111,12 +116,12 @@ def xstrip(filename: bytes) -> bytes:
         handling nested absolute path constructions.
     """
     while xisabs(filename):
-        # strip windows drive with all slashes
-        if re.match(b"\\w:[\\\\/]", filename):
-            filename = re.sub(b"^\\w+:[\\\\/]+", b"", filename)
         # strip all slashes
-        elif re.match(b"[\\\\/]", filename):
-            filename = re.sub(b"^[\\\\/]+", b"", filename)
+        if filename[:1] in (b"\\", b"/"):
+            filename = filename.lstrip(b"\\/")
+        # strip windows drive with all slashes
+        else:
+            filename = filename[2:].lstrip(b"\\/")
     return filename
 
 
@@ -152,9 +157,10 @@ def pathstrip(path: bytes, n: int) -> bytes:
         patches contain paths like 'a/file.txt' and 'b/file.txt' but
         you want to apply them to just 'file.txt'.
     """
-    pathlist = [path]
-    while os.path.dirname(pathlist[0]) != b"":
-        pathlist[0:1] = os.path.split(pathlist[0])
+    pathlist = path.translate(_SLASH_TRANS).split(b"/")
+    if b"" in pathlist[:-1]:
+        # fold repeated and leading slashes, keep a trailing one
+        pathlist = [x for x in pathlist[:-1] if x] + pathlist[-1:]
 
     # If n is greater than or equal to the number of components,
     # return the last component (filename)
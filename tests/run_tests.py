@@ -470,5 +470,11 @@ class TestHelpers(unittest.TestCase):
 
 # ----------------------------------------------------------------------------
 
+def main(argv=None):
+    """Run the test suite in-process, return True if all tests passed."""
+    program = unittest.main(module=sys.modules[__name__], argv=argv, exit=False)
+    return program.result.wasSuccessful()
+
+
 if __name__ == "__main__":
-    unittest.main()
+    sys.exit(0 if main() else 1)
@@ -4,46 +4,35 @@ Pytest configuration and fixtures for python-patch tests.
 This file provides common fixtures and configuration for all test modules.
 """
 
+import os
 import sys
-import tempfile
-import shutil
 from pathlib import Path
+from types import MappingProxyType
 
 import pytest
 
-# Add src to path so we can import the patch module
-sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+_REPO_ROOT = Path(__file__).resolve().parent.parent
+_TESTS_DIR = _REPO_ROOT / "tests"
+_DATA_DIR = _TESTS_DIR / "data"
+
+# Add src to path so we can import the patch module; move an existing entry
+# to the front instead of adding a duplicate, so that the package still wins
+# over the patch.py compatibility wrapper in the repository root
+_SRC_DIR = str(_REPO_ROOT / "src")
+if _SRC_DIR in sys.path:
+    sys.path.remove(_SRC_DIR)
+sys.path.insert(0, _SRC_DIR)
 
 import patch
 
 
 @pytest.fixture
-def temp_dir():
+def temp_dir(tmp_path):
     """Create a temporary directory for test files."""
-    temp_dir = tempfile.mkdtemp()
-    yield temp_dir
-    shutil.rmtree(temp_dir)
-
-
-@pytest.fixture
-def sample_patch_content():
-    """Sample unified diff content for testing."""
-    return b"""diff --git a/test.txt b/test.txt
-index 1234567..abcdefg 100644
---- a/test.txt
-+++ b/test.txt
-@@ -1,3 +1,3 @@
- line1
--line2
-+line2_modified
- line3
-"""
+    return str(tmp_path)
 
 
-@pytest.fixture
-def sample_git_patch():
-    """Sample Git patch content."""
-    return b"""diff --git a/test.txt b/test.txt
+_SAMPLE_GIT_PATCH = b"""diff --git a/test.txt b/test.txt
 index 1234567..abcdefg 100644
 --- a/test.txt
 +++ b/test.txt
@@ -54,11 +43,7 @@ index 1234567..abcdefg 100644
  line3
 """
 
-
-@pytest.fixture
-def sample_svn_patch():
-    """Sample SVN patch content."""
-    return b"""Index: test.txt
+_SAMPLE_SVN_PATCH = b"""Index: test.txt
 ===================================================================
 --- test.txt	(revision 123)
 +++ test.txt	(working copy)
@@ -69,11 +54,7 @@ def sample_svn_patch():
  line3
 """
 
-
-@pytest.fixture
-def sample_hg_patch():
-    """Sample Mercurial patch content."""
-    return b"""diff -r 1234567890ab test.txt
+_SAMPLE_HG_PATCH = b"""diff -r 1234567890ab test.txt
 --- a/test.txt
 +++ b/test.txt
 @@ -1,3 +1,3 @@
@@ -83,56 +64,22 @@ def sample_hg_patch():
  line3
 """
 
-
-@pytest.fixture
-def sample_file_content():
-    """Sample file content for patching."""
-    return b"""line1
+_SAMPLE_FILE_CONTENT = b"""line1
 line2
 line3
 """
 
-
-@pytest.fixture
-def expected_patched_content():
-    """Expected content after applying patch."""
-    return b"""line1
+_EXPECTED_PATCHED_CONTENT = b"""line1
 line2_modified
 line3
 """
 
-
-@pytest.fixture
-def test_files_dir():
-    """Path to the existing test files directory."""
-    return Path(__file__).parent.parent / "tests"
-
-
-@pytest.fixture
-def test_data_dir():
-    """Path to the test data directory."""
-    return Path(__file__).parent.parent / "tests" / "data"
-
-
-@pytest.fixture
-def patch_module():
-    """The patch module for testing."""
-    return patch
-
-
-@pytest.fixture
-def invalid_patch_content():
-    """Invalid patch content for error testing."""
-    return b"""This is not a valid patch file
+_INVALID_PATCH_CONTENT = b"""This is not a valid patch file
 It contains no patch headers
 And should cause parsing to fail
 """
 
-
-@pytest.fixture
-def multifile_patch():
-    """Multi-file patch content."""
-    return b"""diff --git a/file1.txt b/file1.txt
+_MULTIFILE_PATCH = b"""diff --git a/file1.txt b/file1.txt
 index 1111111..2222222 100644
 --- a/file1.txt
 +++ b/file1.txt
@@ -150,61 +97,181 @@ index 3333333..4444444 100644
 +new_content
 """
 
-
-@pytest.fixture
-def empty_file_patch():
-    """Patch for an empty file."""
-    return b"""--- /dev/null
+_EMPTY_FILE_PATCH = b"""--- /dev/null
 +++ b/newfile.txt
 @@ -0,0 +1,2 @@
 +first line
 +second line
 """
 
-
-@pytest.fixture
-def delete_file_patch():
-    """Patch that deletes a file."""
-    return b"""--- a/deleteme.txt
+_DELETE_FILE_PATCH = b"""--- a/deleteme.txt
 +++ /dev/null
 @@ -1,2 +0,0 @@
 -line to delete
 -another line to delete
 """
 
+_CROSS_PLATFORM_PATHS = MappingProxyType(
+    {
+        "absolute_unix": (b"/", b"/path", b"/path/to/file"),
+        "absolute_windows": (b"c:\\", b"c:/", b"c:\\path", b"c:/path"),
+        "relative": (b"path", b"path/to/file", b"path\\to\\file"),
+        "mixed": (b"../something/..\\..\\file.to.patch",),
+    }
+)
+
+
+# Patch payloads are immutable bytes, so every fixture below hands out
+# the same module-level object for the whole session.
+@pytest.fixture(scope="session")
+def sample_git_patch():
+    """Sample Git patch content."""
+    return _SAMPLE_GIT_PATCH
+
+
+@pytest.fixture(scope="session")
+def sample_patch_content():
+    """Sample unified diff content for testing."""
+    return _SAMPLE_GIT_PATCH
+
+
+@pytest.fixture(scope="session")
+def sample_patch_content_str(sample_patch_content):
+    """Sample unified diff content decoded to str."""
+    return sample_patch_content.decode("utf-8")
+
+
+@pytest.fixture(scope="session")
+def sample_patch_file(tmp_path_factory):
+    """Sample unified diff written to disk once per session.
+
+    Applying a patch never modifies the patch file itself, so tests can
+    share it as long as they point --directory at their own tmp dir.
+    """
+    patch_file = tmp_path_factory.mktemp("patches") / "test.patch"
+    patch_file.write_bytes(_SAMPLE_GIT_PATCH)
+    return patch_file
+
+
+@pytest.fixture(scope="session")
+def parsed_git_patch():
+    """Sample Git patch parsed once per session; tests must not modify it."""
+    return patch.fromstring(_SAMPLE_GIT_PATCH)
+
+
+@pytest.fixture(scope="session")
+def sample_svn_patch():
+    """Sample SVN patch content."""
+    return _SAMPLE_SVN_PATCH
+
+
+@pytest.fixture(scope="session")
+def sample_hg_patch():
+    """Sample Mercurial patch content."""
+    return _SAMPLE_HG_PATCH
+
+
+@pytest.fixture(scope="session")
+def sample_file_content():
+    """Sample file content for patching."""
+    return _SAMPLE_FILE_CONTENT
+
+
+@pytest.fixture(scope="session")
+def expected_patched_content():
+    """Expected content after applying patch."""
+    return _EXPECTED_PATCHED_CONTENT
+
+
+@pytest.fixture(scope="session")
+def test_files_dir():
+    """Path to the existing test files directory."""
+    return _TESTS_DIR
+
+
+@pytest.fixture(scope="session")
+def test_data_dir():
+    """Path to the test data directory."""
+    return _DATA_DIR
+
+
+@pytest.fixture(scope="session")
+def patch_module():
+    """The patch module for testing."""
+    return patch
+
+
+@pytest.fixture(scope="session")
+def invalid_patch_content():
+    """Invalid patch content for error testing."""
+    return _INVALID_PATCH_CONTENT
+
+
+@pytest.fixture(scope="session")
+def multifile_patch():
+    """Multi-file patch content."""
+    return _MULTIFILE_PATCH
+
+
+@pytest.fixture(scope="session")
+def empty_file_patch():
+    """Patch for an empty file."""
+    return _EMPTY_FILE_PATCH
+
+
+@pytest.fixture(scope="session")
+def delete_file_patch():
+    """Patch that deletes a file."""
+    return _DELETE_FILE_PATCH
+
 
 # Test data for cross-platform path testing
-@pytest.fixture
+@pytest.fixture(scope="session")
 def cross_platform_paths():
     """Cross-platform path test data."""
-    return {
-        "absolute_unix": [b"/", b"/path", b"/path/to/file"],
-        "absolute_windows": [b"c:\\", b"c:/", b"c:\\path", b"c:/path"],
-        "relative": [b"path", b"path/to/file", b"path\\to\\file"],
-        "mixed": [b"../something/..\\..\\file.to.patch"],
-    }
+    return _CROSS_PLATFORM_PATHS
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def patch_types():
     """Patch type constants for testing."""
-    return {
-        "PLAIN": patch.PLAIN,
-        "GIT": patch.GIT,
-        "HG": patch.HG,
-        "SVN": patch.SVN,
-        "MIXED": patch.MIXED,
-    }
+    return MappingProxyType(
+        {
+            "PLAIN": patch.PLAIN,
+            "GIT": patch.GIT,
+            "HG": patch.HG,
+            "SVN": patch.SVN,
+            "MIXED": patch.MIXED,
+        }
+    )
 
 
-# Configure pytest
-def pytest_configure(config):
-    """Configure pytest with custom markers."""
-    config.addinivalue_line(
-        "markers", "slow: marks tests as slow (deselect with '-m \"not slow\"')"
-    )
-    config.addinivalue_line("markers", "integration: marks tests as integration tests")
-    config.addinivalue_line("markers", "unit: marks tests as unit tests")
+# command line options that need the pytest cache to be written
+_CACHE_OPTIONS = (
+    "lf",
+    "failedfirst",
+    "newfirst",
+    "stepwise",
+    "cacheclear",
+    "cacheshow",
+)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_cmdline_main(config):
+    """Skip .pytest_cache writes on local runs.
+
+    The suite itself never reads the cache, so the cache provider is only
+    kept on CI or when one of its command line options is used.
+    """
+    if os.environ.get("CI"):
+        return None
+    if any(config.getoption(name, default=False) for name in _CACHE_OPTIONS):
+        return None
+    # same as "-p no:cacheprovider", stepwise cannot work without the cache
+    config.pluginmanager.set_blocked("stepwise")
+    config.pluginmanager.set_blocked("cacheprovider")
+    return None
 
 
 # Custom assertion helpers
@@ -214,12 +281,18 @@ class PatchAssertions:
     @staticmethod
     def assert_patch_equal(patch1, patch2):
         """Assert that two patches are equal."""
+        if patch1 is patch2:
+            return
         assert len(patch1.items) == len(patch2.items)
         for p1, p2 in zip(patch1.items, patch2.items):
+            if p1 is p2:
+                continue
             assert p1.source == p2.source
             assert p1.target == p2.target
             assert len(p1.hunks) == len(p2.hunks)
             for h1, h2 in zip(p1.hunks, p2.hunks):
+                if h1 is h2:
+                    continue
                 assert h1.startsrc == h2.startsrc
                 assert h1.starttgt == h2.starttgt
                 assert h1.linessrc == h2.linessrc
@@ -229,11 +302,10 @@ class PatchAssertions:
     @staticmethod
     def assert_file_content_equal(file1, file2):
         """Assert that two files have equal content."""
-        with open(file1, "rb") as f1, open(file2, "rb") as f2:
-            assert f1.read() == f2.read()
+        assert Path(file1).read_bytes() == Path(file2).read_bytes()
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def patch_assertions():
     """Provide custom patch assertion helpers."""
     return PatchAssertions()
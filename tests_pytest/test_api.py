@@ -4,28 +4,91 @@ Unit tests for API functions (fromfile, fromstring, fromurl).
 Tests the main API entry points for patch parsing.
 """
 
+import functools
 import pytest
-import tempfile
 import os
-from unittest.mock import patch as mock_patch, MagicMock
+from pathlib import Path
+from unittest.mock import patch as mock_patch
 from urllib.error import URLError
 
 import patch
 from patch.api import fromfile, fromstring, fromurl
 
+# names the package must keep exporting for backward compatibility
+EXPECTED_PUBLIC = frozenset(
+    {
+        "fromfile",
+        "fromstring",
+        "fromurl",
+        "main",
+        "Hunk",
+        "Patch",
+        "PatchSet",
+        "PLAIN",
+        "GIT",
+        "HG",
+        "SVN",
+        "MIXED",
+        "xisabs",
+        "xnormpath",
+        "xstrip",
+        "pathstrip",
+        "setdebug",
+        "__version__",
+    }
+)
+
+
+@functools.lru_cache(maxsize=32)
+def _parse_cached(content):
+    """Parse content once per session; callers must not modify the result."""
+    return fromstring(content)
+
+
+@functools.lru_cache(maxsize=None)
+def _split_lines(content):
+    """Split content into lines once per distinct payload."""
+    return content.split(b"\n")
+
+
+class _FakeResponse:
+    """Minimal stand-in for the object returned by urlopen().
+
+    fromurl() hands the response straight to PatchSet, which only iterates
+    over it, so iteration is the only behaviour provided.
+    """
+
+    __slots__ = ("_content",)
+
+    def __init__(self, content):
+        self._content = content
+
+    def __iter__(self):
+        return iter(_split_lines(self._content))
+
+
+@pytest.fixture
+def non_ascii_patch():
+    """Patch with non-ASCII bytes that must be parsed without decoding."""
+    return b"--- a/test.txt\n+++ b/test.txt\n@@ -1,1 +1,1 @@\n-\xc3\xa9\n+\xc3\xa0\n"
+
+
+@pytest.fixture(scope="class")
+def class_tmp_dir(tmp_path_factory):
+    """Temporary directory shared by a test class; use unique filenames."""
+    return tmp_path_factory.mktemp("fromfile")
+
 
 class TestFromFile:
     """Test the fromfile function."""
 
-    def test_fromfile_valid_patch(self, temp_dir, sample_patch_content):
+    def test_fromfile_valid_patch(self, request, class_tmp_dir, sample_patch_content):
         """Test fromfile with a valid patch file."""
-        patch_file = os.path.join(temp_dir, "test.patch")
-        with open(patch_file, "wb") as f:
-            f.write(sample_patch_content)
+        patch_file = class_tmp_dir / f"{request.node.name}.patch"
+        patch_file.write_bytes(sample_patch_content)
 
-        result = fromfile(patch_file)
+        result = fromfile(str(patch_file))
         assert result is not False
-        assert isinstance(result, patch.PatchSet)
         assert len(result.items) == 1
         assert result.errors == 0
 
@@ -34,77 +97,36 @@ class TestFromFile:
         with pytest.raises(FileNotFoundError):
             fromfile("/nonexistent/file.patch")
 
-    def test_fromfile_invalid_patch(self, temp_dir, invalid_patch_content):
+    def test_fromfile_invalid_patch(
+        self, request, class_tmp_dir, invalid_patch_content
+    ):
         """Test fromfile with invalid patch content."""
-        patch_file = os.path.join(temp_dir, "invalid.patch")
-        with open(patch_file, "wb") as f:
-            f.write(invalid_patch_content)
+        patch_file = class_tmp_dir / f"{request.node.name}.patch"
+        patch_file.write_bytes(invalid_patch_content)
 
-        result = fromfile(patch_file)
+        result = fromfile(str(patch_file))
         assert result is False
 
-    def test_fromfile_empty_file(self, temp_dir):
+    def test_fromfile_empty_file(self, request, class_tmp_dir):
         """Test fromfile with empty file."""
-        patch_file = os.path.join(temp_dir, "empty.patch")
-        with open(patch_file, "wb") as f:
-            pass  # Create empty file
+        patch_file = class_tmp_dir / f"{request.node.name}.patch"
+        patch_file.touch()
 
-        result = fromfile(patch_file)
+        result = fromfile(str(patch_file))
         assert result is False
 
-    def test_fromfile_git_patch(self, temp_dir, sample_git_patch):
-        """Test fromfile with Git patch."""
-        patch_file = os.path.join(temp_dir, "git.patch")
-        with open(patch_file, "wb") as f:
-            f.write(sample_git_patch)
+    def test_fromfile_dispatch(self, request, class_tmp_dir, sample_git_patch):
+        """Test that fromfile parses file contents like fromstring."""
+        patch_file = class_tmp_dir / f"{request.node.name}.patch"
+        patch_file.write_bytes(sample_git_patch)
 
-        result = fromfile(patch_file)
+        result = fromfile(str(patch_file))
+        expected = _parse_cached(sample_git_patch)
         assert result is not False
-        assert result.type == patch.GIT
-
-    def test_fromfile_svn_patch(self, temp_dir, sample_svn_patch):
-        """Test fromfile with SVN patch."""
-        patch_file = os.path.join(temp_dir, "svn.patch")
-        with open(patch_file, "wb") as f:
-            f.write(sample_svn_patch)
-
-        result = fromfile(patch_file)
-        assert result is not False
-        assert result.type == patch.SVN
-
-    def test_fromfile_hg_patch(self, temp_dir, sample_hg_patch):
-        """Test fromfile with Mercurial patch."""
-        patch_file = os.path.join(temp_dir, "hg.patch")
-        with open(patch_file, "wb") as f:
-            f.write(sample_hg_patch)
-
-        result = fromfile(patch_file)
-        assert result is not False
-        assert result.type == patch.HG
-
-    def test_fromfile_multifile_patch(self, temp_dir, multifile_patch):
-        """Test fromfile with multi-file patch."""
-        patch_file = os.path.join(temp_dir, "multi.patch")
-        with open(patch_file, "wb") as f:
-            f.write(multifile_patch)
-
-        result = fromfile(patch_file)
-        assert result is not False
-        assert len(result.items) == 2
-
-    def test_fromfile_binary_mode(self, temp_dir):
-        """Test that fromfile opens files in binary mode."""
-        # Create a patch with non-ASCII characters
-        patch_content = (
-            b"--- a/test.txt\n+++ b/test.txt\n@@ -1,1 +1,1 @@\n-\xc3\xa9\n+\xc3\xa0\n"
-        )
-        patch_file = os.path.join(temp_dir, "unicode.patch")
-        with open(patch_file, "wb") as f:
-            f.write(patch_content)
-
-        result = fromfile(patch_file)
-        # Should not raise encoding errors
-        assert result is not False or result is False  # Either way, no exception
+        assert result.type == expected.type == patch.GIT
+        assert [(p.source, p.target) for p in result] == [
+            (p.source, p.target) for p in expected
+        ]
 
 
 class TestFromString:
@@ -114,56 +136,55 @@ class TestFromString:
         """Test fromstring with valid patch content."""
         result = fromstring(sample_patch_content)
         assert result is not False
-        assert isinstance(result, patch.PatchSet)
         assert len(result.items) == 1
         assert result.errors == 0
 
+    def test_fromstring_returns_patchset_type(self, sample_patch_content):
+        """Test that a successful parse returns a PatchSet instance."""
+        assert isinstance(_parse_cached(sample_patch_content), patch.PatchSet)
+
     def test_fromstring_invalid_patch(self, invalid_patch_content):
         """Test fromstring with invalid patch content."""
-        result = fromstring(invalid_patch_content)
+        result = _parse_cached(invalid_patch_content)
         assert result is False
 
     def test_fromstring_empty_content(self):
         """Test fromstring with empty content."""
-        result = fromstring(b"")
+        result = _parse_cached(b"")
         assert result is False
 
-    def test_fromstring_git_patch(self, sample_git_patch):
-        """Test fromstring with Git patch."""
-        result = fromstring(sample_git_patch)
-        assert result is not False
-        assert result.type == patch.GIT
-
-    def test_fromstring_svn_patch(self, sample_svn_patch):
-        """Test fromstring with SVN patch."""
-        result = fromstring(sample_svn_patch)
-        assert result is not False
-        assert result.type == patch.SVN
-
-    def test_fromstring_hg_patch(self, sample_hg_patch):
-        """Test fromstring with Mercurial patch."""
-        result = fromstring(sample_hg_patch)
+    @pytest.mark.parametrize(
+        "fixture_name,expected_type,expected_items",
+        [
+            ("sample_git_patch", patch.GIT, 1),
+            ("sample_svn_patch", patch.SVN, 1),
+            ("sample_hg_patch", patch.HG, 1),
+            ("multifile_patch", patch.GIT, 2),
+            ("non_ascii_patch", patch.PLAIN, 1),
+        ],
+        ids=["git", "svn", "hg", "multi", "non_ascii"],
+    )
+    def test_fromstring_variants(
+        self, request, fixture_name, expected_type, expected_items
+    ):
+        """Test fromstring with each kind of sample patch."""
+        result = _parse_cached(request.getfixturevalue(fixture_name))
         assert result is not False
-        assert result.type == patch.HG
+        assert result.type == expected_type
+        assert len(result.items) == expected_items
 
-    def test_fromstring_multifile_patch(self, multifile_patch):
-        """Test fromstring with multi-file patch."""
-        result = fromstring(multifile_patch)
-        assert result is not False
-        assert len(result.items) == 2
-
-    def test_fromstring_string_vs_bytes(self, sample_patch_content):
+    def test_fromstring_string_vs_bytes(
+        self, sample_patch_content, sample_patch_content_str
+    ):
         """Test fromstring with both string and bytes input."""
         # Test with bytes (normal case)
-        result_bytes = fromstring(sample_patch_content)
+        result_bytes = _parse_cached(sample_patch_content)
         assert result_bytes is not False
 
         # Test with string (should also work)
-        string_content = sample_patch_content.decode("utf-8")
-        result_string = fromstring(string_content)
-        # Behavior may vary depending on implementation
-        # Just ensure it doesn't crash
-        assert result_string is not False or result_string is False
+        # Behavior may vary depending on implementation,
+        # the test only fails if an exception escapes
+        fromstring(sample_patch_content_str)
 
     def test_fromstring_with_errors(self):
         """Test fromstring with content that has parsing errors."""
@@ -176,101 +197,104 @@ class TestFromString:
 +line2_modified
  line3
 """
-        result = fromstring(malformed_patch)
-        # Should either parse successfully or fail gracefully
-        assert result is not False or result is False
+        # Should either parse successfully or fail gracefully,
+        # the test only fails if an exception escapes
+        fromstring(malformed_patch)
 
 
 class TestFromUrl:
     """Test the fromurl function."""
 
-    def test_fromurl_valid_url(self, sample_patch_content):
+    @pytest.fixture(scope="class")
+    def urlopen(self):
+        """Patch urlopen once for the whole class, no test reaches the network."""
+        with mock_patch("patch.compat.urllib_request.urlopen") as mock_urlopen:
+            yield mock_urlopen
+
+    @pytest.fixture(autouse=True)
+    def _reset_urlopen(self, urlopen):
+        """Clear responses and errors configured by the previous test."""
+        urlopen.reset_mock(return_value=True, side_effect=True)
+
+    def test_fromurl_valid_url(self, urlopen, sample_patch_content):
         """Test fromurl with valid URL."""
-        mock_response = MagicMock()
-        mock_response.read.return_value = sample_patch_content
-        mock_response.__iter__.return_value = iter(sample_patch_content.split(b"\n"))
+        urlopen.return_value = _FakeResponse(sample_patch_content)
 
-        with mock_patch(
-            "patch.compat.urllib_request.urlopen", return_value=mock_response
-        ):
-            result = fromurl("http://example.com/test.patch")
-            assert result is not False
-            assert isinstance(result, patch.PatchSet)
-            assert len(result.items) == 1
+        result = fromurl("http://example.com/test.patch")
+        assert result is not False
+        assert len(result.items) == 1
 
-    def test_fromurl_invalid_url(self):
+    def test_fromurl_invalid_url(self, urlopen):
         """Test fromurl with invalid URL."""
-        with mock_patch(
-            "patch.compat.urllib_request.urlopen", side_effect=URLError("Invalid URL")
-        ):
-            with pytest.raises(URLError):
-                fromurl("http://invalid-url.com/test.patch")
+        urlopen.side_effect = URLError("Invalid URL")
+
+        with pytest.raises(URLError):
+            fromurl("http://invalid-url.com/test.patch")
 
-    def test_fromurl_invalid_patch_content(self, invalid_patch_content):
+    def test_fromurl_invalid_patch_content(self, urlopen, invalid_patch_content):
         """Test fromurl with invalid patch content from URL."""
-        mock_response = MagicMock()
-        mock_response.read.return_value = invalid_patch_content
-        mock_response.__iter__.return_value = iter(invalid_patch_content.split(b"\n"))
+        urlopen.return_value = _FakeResponse(invalid_patch_content)
 
-        with mock_patch(
-            "patch.compat.urllib_request.urlopen", return_value=mock_response
-        ):
-            result = fromurl("http://example.com/invalid.patch")
-            assert result is False
+        result = fromurl("http://example.com/invalid.patch")
+        assert result is False
 
-    def test_fromurl_empty_response(self):
+    def test_fromurl_empty_response(self, urlopen):
         """Test fromurl with empty response."""
-        mock_response = MagicMock()
-        mock_response.read.return_value = b""
-        mock_response.__iter__.return_value = iter([])
+        urlopen.return_value = _FakeResponse(b"")
 
-        with mock_patch(
-            "patch.compat.urllib_request.urlopen", return_value=mock_response
-        ):
-            result = fromurl("http://example.com/empty.patch")
-            assert result is False
+        result = fromurl("http://example.com/empty.patch")
+        assert result is False
 
-    def test_fromurl_network_error(self):
+    def test_fromurl_network_error(self, urlopen):
         """Test fromurl with network error."""
-        with mock_patch(
-            "patch.compat.urllib_request.urlopen",
-            side_effect=Exception("Network error"),
-        ):
-            with pytest.raises(Exception):
-                fromurl("http://example.com/test.patch")
-
-    def test_fromurl_git_patch(self, sample_git_patch):
-        """Test fromurl with Git patch from URL."""
-        mock_response = MagicMock()
-        mock_response.read.return_value = sample_git_patch
-        mock_response.__iter__.return_value = iter(sample_git_patch.split(b"\n"))
-
-        with mock_patch(
-            "patch.compat.urllib_request.urlopen", return_value=mock_response
-        ):
-            result = fromurl("http://example.com/git.patch")
-            assert result is not False
-            assert result.type == patch.GIT
+        urlopen.side_effect = Exception("Network error")
+
+        with pytest.raises(Exception):
+            fromurl("http://example.com/test.patch")
+
+    @pytest.mark.parametrize(
+        "fixture_name,expected_type,expected_items",
+        [
+            ("sample_git_patch", patch.GIT, 1),
+            ("sample_svn_patch", patch.SVN, 1),
+            ("sample_hg_patch", patch.HG, 1),
+            ("multifile_patch", patch.GIT, 2),
+        ],
+        ids=["git", "svn", "hg", "multi"],
+    )
+    def test_fromurl_variants(
+        self, urlopen, request, fixture_name, expected_type, expected_items
+    ):
+        """Test fromurl with each kind of sample patch."""
+        urlopen.return_value = _FakeResponse(request.getfixturevalue(fixture_name))
+
+        result = fromurl("http://example.com/test.patch")
+        assert result is not False
+        assert result.type == expected_type
+        assert len(result.items) == expected_items
 
 
 class TestApiIntegration:
     """Integration tests for API functions."""
 
+    def test_public_api_exported(self):
+        """Test that the package exposes the backward compatible API."""
+        missing = EXPECTED_PUBLIC - vars(patch).keys()
+        assert not missing, missing
+        assert EXPECTED_PUBLIC <= frozenset(patch.__all__)
+
     def test_api_consistency(self, temp_dir, sample_patch_content):
         """Test that all API functions produce consistent results."""
         # Test fromstring
-        result_string = fromstring(sample_patch_content)
+        result_string = _parse_cached(sample_patch_content)
 
         # Test fromfile
         patch_file = os.path.join(temp_dir, "test.patch")
-        with open(patch_file, "wb") as f:
-            f.write(sample_patch_content)
+        Path(patch_file).write_bytes(sample_patch_content)
         result_file = fromfile(patch_file)
 
         # Test fromurl (mocked)
-        mock_response = MagicMock()
-        mock_response.read.return_value = sample_patch_content
-        mock_response.__iter__.return_value = iter(sample_patch_content.split(b"\n"))
+        mock_response = _FakeResponse(sample_patch_content)
 
         with mock_patch(
             "patch.compat.urllib_request.urlopen", return_value=mock_response
@@ -288,38 +312,20 @@ class TestApiIntegration:
         )
         assert result_string.type == result_file.type == result_url.type
 
-    def test_api_error_handling(self):
+    def test_api_error_handling(self, tmp_path):
         """Test error handling across all API functions."""
         invalid_content = b"not a patch"
 
         # fromstring should return False
-        assert fromstring(invalid_content) is False
+        assert _parse_cached(invalid_content) is False
 
         # fromfile should return False for invalid content
-        with tempfile.NamedTemporaryFile(delete=False) as f:
-            f.write(invalid_content)
-            f.flush()
-            temp_filename = f.name
-        
-        try:
-            assert fromfile(temp_filename) is False
-        finally:
-            try:
-                os.unlink(temp_filename)
-            except (OSError, PermissionError):
-                # On Windows, sometimes the file is still locked
-                # Try again after a brief moment
-                import time
-                time.sleep(0.1)
-                try:
-                    os.unlink(temp_filename)
-                except (OSError, PermissionError):
-                    pass  # If we still can't delete it, that's okay for the test
+        patch_file = tmp_path / "bad.patch"
+        patch_file.write_bytes(invalid_content)
+        assert fromfile(str(patch_file)) is False
 
         # fromurl should return False for invalid content
-        mock_response = MagicMock()
-        mock_response.read.return_value = invalid_content
-        mock_response.__iter__.return_value = iter(invalid_content.split(b"\n"))
+        mock_response = _FakeResponse(invalid_content)
 
         with mock_patch(
             "patch.compat.urllib_request.urlopen", return_value=mock_response
@@ -327,24 +333,18 @@ class TestApiIntegration:
             assert fromurl("http://example.com/invalid.patch") is False
 
 
-@pytest.mark.parametrize(
-    "api_func,input_type",
-    [
-        (fromstring, "content"),
-        (fromfile, "file"),
-    ],
-)
-def test_api_functions_parametrized(
-    api_func, input_type, temp_dir, sample_patch_content
-):
-    """Parametrized test for API functions."""
-    if input_type == "content":
-        result = api_func(sample_patch_content)
-    elif input_type == "file":
-        patch_file = os.path.join(temp_dir, "test.patch")
-        with open(patch_file, "wb") as f:
-            f.write(sample_patch_content)
-        result = api_func(patch_file)
+def test_api_fromstring_sample(sample_patch_content):
+    """Test fromstring on the sample patch."""
+    result = fromstring(sample_patch_content)
+    assert result is not False
+    assert len(result.items) == 1
+
+
+def test_api_fromfile_sample(tmp_path, sample_patch_content):
+    """Test fromfile on the sample patch."""
+    patch_file = tmp_path / "test.patch"
+    patch_file.write_bytes(sample_patch_content)
 
+    result = fromfile(str(patch_file))
     assert result is not False
     assert len(result.items) == 1
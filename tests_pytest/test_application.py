@@ -6,9 +6,11 @@ file matching, and stream processing.
 """
 
 import os
+import tracemalloc
 from io import BytesIO
 
-import patch
+import pytest
+
 from patch.application import (
     diffstat,
     findfile,
@@ -131,6 +133,30 @@ class TestDiffstat:
             if "test.txt" in line:
                 assert len(line) < 200  # Reasonable line length
 
+    def test_diffstat_counts_only_changed_lines(self):
+        """Test that context and no-newline marker lines are not counted."""
+        patchset = PatchSet()
+        patch_obj = Patch()
+        patch_obj.target = b"test.txt"
+
+        hunk = Hunk()
+        hunk.text = [
+            b" context\n",
+            b"-old\n",
+            b"\\ No newline at end of file\n",
+            b"+newer\n",
+            b"+extra\n",
+        ]
+        patch_obj.hunks = [hunk]
+        patchset.items = [patch_obj]
+
+        result = diffstat(patchset)
+
+        assert result.splitlines() == [
+            " test.txt | 3 ++-",
+            " 1 files changed, 2 insertions(+), 1 deletions(-), +8 bytes",
+        ]
+
 
 class TestFindfile:
     """Test the findfile function."""
@@ -238,6 +264,29 @@ class TestCanPatch:
         result = can_patch(patchset, test_file)
         assert result is False
 
+    def test_can_patch_prefers_full_path_match(self, temp_dir):
+        """Test that the entry for the same path wins over a basename match."""
+        test_file = os.path.join(temp_dir, "b", "test.txt")
+        os.mkdir(os.path.dirname(test_file))
+        with open(test_file, "wb") as f:
+            f.write(b"content b\n")
+
+        patchset = PatchSet()
+        for dirname in ("a", "b"):
+            patch_obj = Patch()
+            patch_obj.source = os.path.join(temp_dir, dirname, "test.txt").encode()
+            hunk = Hunk()
+            hunk.starttgt = 1
+            hunk.text = [b" content %s\n" % dirname.encode()]
+            patch_obj.hunks = [hunk]
+            patchset.items.append(patch_obj)
+
+        assert can_patch(patchset, test_file) is True
+
+        # with no full path match the first basename match decides
+        patchset.items[1].source = b"c/test.txt"
+        assert can_patch(patchset, test_file) is False
+
     def test_can_patch_file_not_in_patchset(self, temp_dir):
         """Test can_patch with file not in patchset."""
         test_file = os.path.join(temp_dir, "test.txt")
@@ -296,6 +345,39 @@ class TestMatchFileHunks:
         result = match_file_hunks(test_file, [hunk])
         assert result is False
 
+    def test_match_file_hunks_large_file(self, temp_dir):
+        """Test hunk matching against a file large enough to be mmapped."""
+        test_file = os.path.join(temp_dir, "large.txt")
+        with open(test_file, "wb") as f:
+            f.writelines(b"line %d\n" % i for i in range(20000))
+
+        hunk = Hunk()
+        hunk.starttgt = 15000
+        hunk.text = [b" line 14999\n", b"-gone\n", b"+line 15000\n"]
+        assert match_file_hunks(test_file, [hunk]) is True
+
+        hunk.text = [b" line 14999\n", b" changed\n"]
+        assert match_file_hunks(test_file, [hunk]) is False
+
+    def test_match_file_hunks_large_file_memory(self, temp_dir):
+        """Test that lines skipped before a hunk are not held in memory."""
+        test_file = os.path.join(temp_dir, "large.txt")
+        with open(test_file, "wb") as f:
+            f.writelines(b"line %d\n" % i for i in range(400000))
+
+        hunk = Hunk()
+        hunk.starttgt = 300000
+        hunk.text = [b" line 299999\n"]
+
+        tracemalloc.start()
+        try:
+            assert match_file_hunks(test_file, [hunk]) is True
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        assert peak < 2 * 1024 * 1024
+
 
 class TestPatchStream:
     """Test the patch_stream function."""
@@ -324,10 +406,8 @@ class TestPatchStream:
         hunk.startsrc = 1
         hunk.text = [b" line1\n", b"+line2\n", b" line3\n"]
 
-        result = list(patch_stream(input_stream, [hunk]))
-
         # Should have added line2
-        content = b"".join(result)
+        content = b"".join(patch_stream(input_stream, [hunk]))
         assert b"line1\nline2\nline3\n" == content
 
     def test_patch_stream_deletion(self):
@@ -338,10 +418,8 @@ class TestPatchStream:
         hunk.startsrc = 1
         hunk.text = [b" line1\n", b"-line2\n", b" line3\n"]
 
-        result = list(patch_stream(input_stream, [hunk]))
-
         # Should have removed line2
-        content = b"".join(result)
+        content = b"".join(patch_stream(input_stream, [hunk]))
         assert b"line1\nline3\n" == content
 
     def test_patch_stream_line_ending_detection(self):
@@ -353,10 +431,8 @@ class TestPatchStream:
         hunk.startsrc = 2
         hunk.text = [b" line1\n", b"-line2\n", b"+modified\n", b" line3\n"]
 
-        result = list(patch_stream(input_stream, [hunk]))
-
         # Should preserve line endings
-        content = b"".join(result)
+        content = b"".join(patch_stream(input_stream, [hunk]))
         assert b"\r\n" in content  # Should maintain CRLF
 
 
@@ -387,6 +463,62 @@ class TestWriteHunks:
         assert b"line3\n" in content
         assert b"line2\n" not in content
 
+    def test_write_hunks_copies_tail(self, temp_dir):
+        """Test that lines after the last hunk are copied unchanged."""
+        src_file = os.path.join(temp_dir, "source.txt")
+        tgt_file = os.path.join(temp_dir, "target.txt")
+
+        with open(src_file, "wb") as f:
+            f.write(b"line1\nline2\nline3\r\nline4")
+
+        hunk = Hunk()
+        hunk.startsrc = 1
+        hunk.text = [b"-line1\n", b"+first\n"]
+
+        write_hunks(src_file, tgt_file, [hunk])
+
+        with open(tgt_file, "rb") as f:
+            assert f.read() == b"first\nline2\nline3\r\nline4"
+
+    def test_write_hunks_large_file_memory(self, temp_dir):
+        """Test that lines before a hunk are streamed, not held in memory."""
+        src_file = os.path.join(temp_dir, "source.txt")
+        tgt_file = os.path.join(temp_dir, "target.txt")
+        lines = [b"line %d\n" % i for i in range(400000)]
+        with open(src_file, "wb") as f:
+            f.writelines(lines)
+
+        hunk = Hunk()
+        hunk.startsrc = 300000
+        hunk.text = [b"-line 299999\n", b"+changed\n"]
+
+        tracemalloc.start()
+        try:
+            write_hunks(src_file, tgt_file, [hunk])
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        # the file is several megabytes, only a batch may be held at once
+        assert peak < 2 * 1024 * 1024
+        lines[299999] = b"changed\n"
+        with open(tgt_file, "rb") as f:
+            assert f.read() == b"".join(lines)
+
+    def test_write_hunks_failure_keeps_target(self, temp_dir):
+        """Test that a failed write leaves the target and no temp files."""
+        tgt_file = os.path.join(temp_dir, "target.txt")
+        with open(tgt_file, "wb") as f:
+            f.write(b"original\n")
+
+        missing = os.path.join(temp_dir, "missing.txt")
+        with pytest.raises(FileNotFoundError):
+            write_hunks(missing, tgt_file, [])
+
+        assert os.listdir(temp_dir) == ["target.txt"]
+        with open(tgt_file, "rb") as f:
+            assert f.read() == b"original\n"
+
     def test_write_hunks_permissions(self, temp_dir, sample_file_content):
         """Test that write_hunks preserves file permissions."""
         src_file = os.path.join(temp_dir, "source.txt")
@@ -503,7 +635,7 @@ class TestApplicationIntegration:
     def test_full_patch_application_workflow(
         self,
         temp_dir,
-        sample_patch_content,
+        parsed_git_patch,
         sample_file_content,
         expected_patched_content,
     ):
@@ -513,8 +645,7 @@ class TestApplicationIntegration:
         with open(src_file, "wb") as f:
             f.write(sample_file_content)
 
-        # Parse patch
-        patchset = patch.fromstring(sample_patch_content)
+        patchset = parsed_git_patch
         assert patchset is not False
 
         # Apply patch
@@ -530,7 +661,7 @@ class TestApplicationIntegration:
     def test_patch_revert_workflow(
         self,
         temp_dir,
-        sample_patch_content,
+        parsed_git_patch,
         sample_file_content,
         expected_patched_content,
     ):
@@ -540,8 +671,8 @@ class TestApplicationIntegration:
         with open(src_file, "wb") as f:
             f.write(sample_file_content)
 
-        # Parse and apply patch
-        patchset = patch.fromstring(sample_patch_content)
+        # Apply patch
+        patchset = parsed_git_patch
         patchset.apply(root=temp_dir)
 
         # Verify patch was applied
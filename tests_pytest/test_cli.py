@@ -5,15 +5,39 @@ Tests command-line interface including argument parsing,
 option handling, and main function execution.
 """
 
+import os
 import pytest
 import sys
-import os
+from contextlib import contextmanager
 from unittest.mock import patch as mock_patch, MagicMock
 from io import StringIO
 
 from patch.cli import main
 
 
+@contextmanager
+def _argv(args):
+    """Temporarily replace sys.argv, without the overhead of mock.patch."""
+    saved = sys.argv
+    sys.argv = list(args)
+    try:
+        yield
+    finally:
+        sys.argv = saved
+
+
+def _run_main(args):
+    """Run main() with args as sys.argv and return its exit status."""
+    with _argv(args):
+        try:
+            main()
+        except SystemExit as e:
+            if e.code is None:
+                return 0
+            return e.code if isinstance(e.code, int) else 1
+    return 0
+
+
 class TestMainFunction:
     """Test the main CLI function."""
 
@@ -21,7 +45,7 @@ class TestMainFunction:
         """Test main function with --version option."""
         test_args = ["patch", "--version"]
 
-        with mock_patch.object(sys, "argv", test_args):
+        with _argv(test_args):
             with pytest.raises(SystemExit) as exc_info:
                 main()
 
@@ -35,7 +59,7 @@ class TestMainFunction:
         """Test main function with --help option."""
         test_args = ["patch", "--help"]
 
-        with mock_patch.object(sys, "argv", test_args):
+        with _argv(test_args):
             with pytest.raises(SystemExit) as exc_info:
                 main()
 
@@ -47,7 +71,7 @@ class TestMainFunction:
         """Test main function with no arguments."""
         test_args = ["patch"]
 
-        with mock_patch.object(sys, "argv", test_args):
+        with _argv(test_args):
             with pytest.raises(SystemExit):
                 main()
 
@@ -57,22 +81,19 @@ class TestMainFunction:
             assert "usage:" in captured.out.lower()
 
     def test_main_with_patch_file(
-        self, temp_dir, sample_patch_content, sample_file_content
+        self, tmp_path, sample_patch_file, sample_file_content
     ):
         """Test main function with patch file."""
-        # Create patch file
-        patch_file = os.path.join(temp_dir, "test.patch")
-        with open(patch_file, "wb") as f:
-            f.write(sample_patch_content)
+        # Patch file shared by the whole session
+        patch_file = str(sample_patch_file)
 
         # Create source file
-        source_file = os.path.join(temp_dir, "test.txt")
-        with open(source_file, "wb") as f:
-            f.write(sample_file_content)
+        source_file = tmp_path / "test.txt"
+        source_file.write_bytes(sample_file_content)
 
-        test_args = ["patch", "--directory", temp_dir, patch_file]
+        test_args = ["patch", "--directory", str(tmp_path), patch_file]
 
-        with mock_patch.object(sys, "argv", test_args):
+        with _argv(test_args):
             try:
                 main()
                 # If successful, check that file was patched
@@ -87,22 +108,20 @@ class TestMainFunction:
         """Test main function with non-existent patch file."""
         test_args = ["patch", "/nonexistent/file.patch"]
 
-        with mock_patch.object(sys, "argv", test_args):
+        with _argv(test_args):
             with pytest.raises(SystemExit) as exc_info:
                 main()
 
             # Should exit with error code
             assert exc_info.value.code != 0
 
-    def test_main_with_diffstat_option(self, temp_dir, sample_patch_content):
+    def test_main_with_diffstat_option(self, sample_patch_file):
         """Test main function with --diffstat option."""
-        patch_file = os.path.join(temp_dir, "test.patch")
-        with open(patch_file, "wb") as f:
-            f.write(sample_patch_content)
+        patch_file = str(sample_patch_file)
 
         test_args = ["patch", "--diffstat", patch_file]
 
-        with mock_patch.object(sys, "argv", test_args), mock_patch(
+        with _argv(test_args), mock_patch(
             "sys.stdout", new_callable=StringIO
         ) as mock_stdout:
 
@@ -116,87 +135,26 @@ class TestMainFunction:
             assert "test.txt" in output
             assert "files changed" in output
 
-    def test_main_with_verbose_option(
-        self, temp_dir, sample_patch_content, sample_file_content
-    ):
-        """Test main function with --verbose option."""
-        patch_file = os.path.join(temp_dir, "test.patch")
-        with open(patch_file, "wb") as f:
-            f.write(sample_patch_content)
-
-        source_file = os.path.join(temp_dir, "test.txt")
-        with open(source_file, "wb") as f:
-            f.write(sample_file_content)
-
-        test_args = ["patch", "--verbose", "--directory", temp_dir, patch_file]
-
-        with mock_patch.object(sys, "argv", test_args):
-            try:
-                main()
-            except SystemExit as e:
-                assert e.code == 0
-
-    def test_main_with_quiet_option(
-        self, temp_dir, sample_patch_content, sample_file_content
-    ):
-        """Test main function with --quiet option."""
-        patch_file = os.path.join(temp_dir, "test.patch")
-        with open(patch_file, "wb") as f:
-            f.write(sample_patch_content)
-
-        source_file = os.path.join(temp_dir, "test.txt")
-        with open(source_file, "wb") as f:
-            f.write(sample_file_content)
-
-        test_args = ["patch", "--quiet", "--directory", temp_dir, patch_file]
-
-        with mock_patch.object(sys, "argv", test_args):
-            try:
-                main()
-            except SystemExit as e:
-                assert e.code == 0
-
-    def test_main_with_debug_option(
-        self, temp_dir, sample_patch_content, sample_file_content
-    ):
-        """Test main function with --debug option."""
-        patch_file = os.path.join(temp_dir, "test.patch")
-        with open(patch_file, "wb") as f:
-            f.write(sample_patch_content)
-
-        source_file = os.path.join(temp_dir, "test.txt")
-        with open(source_file, "wb") as f:
-            f.write(sample_file_content)
-
-        test_args = ["patch", "--debug", "--directory", temp_dir, patch_file]
-
-        with mock_patch.object(sys, "argv", test_args):
-            try:
-                main()
-            except SystemExit as e:
-                assert e.code == 0
-
-    def test_main_with_directory_option(
-        self, temp_dir, sample_patch_content, sample_file_content
+    @pytest.mark.parametrize(
+        "flag",
+        ["--verbose", "--quiet", "--debug", None],
+        ids=["verbose", "quiet", "debug", "directory_only"],
+    )
+    def test_main_with_logging_option(
+        self, flag, tmp_path, sample_patch_file, sample_file_content
     ):
-        """Test main function with --directory option."""
-        patch_file = os.path.join(temp_dir, "test.patch")
-        with open(patch_file, "wb") as f:
-            f.write(sample_patch_content)
+        """Test main function with each logging option and --directory."""
+        (tmp_path / "test.txt").write_bytes(sample_file_content)
 
-        source_file = os.path.join(temp_dir, "test.txt")
-        with open(source_file, "wb") as f:
-            f.write(sample_file_content)
+        test_args = (
+            ["patch"]
+            + ([flag] if flag else [])
+            + ["--directory", str(tmp_path), str(sample_patch_file)]
+        )
 
-        test_args = ["patch", "--directory", temp_dir, patch_file]
+        assert _run_main(test_args) == 0
 
-        with mock_patch.object(sys, "argv", test_args):
-            try:
-                main()
-            except SystemExit as e:
-                assert e.code == 0
-
-    def test_main_with_strip_option(self, temp_dir):
+    def test_main_with_strip_option(self, tmp_path):
         """Test main function with --strip option."""
         # Create a patch with path prefixes
         patch_content = b"""diff --git a/subdir/test.txt b/subdir/test.txt
@@ -209,39 +167,37 @@ index 1234567..abcdefg 100644
 +line2_modified
  line3
 """
-        patch_file = os.path.join(temp_dir, "test.patch")
-        with open(patch_file, "wb") as f:
-            f.write(patch_content)
+        patch_file = tmp_path / "test.patch"
+        patch_file.write_bytes(patch_content)
 
         # Create source file without prefix
-        source_file = os.path.join(temp_dir, "test.txt")
-        with open(source_file, "wb") as f:
-            f.write(b"line1\nline2\nline3\n")
+        source_file = tmp_path / "test.txt"
+        source_file.write_bytes(b"line1\nline2\nline3\n")
 
-        test_args = ["patch", "--strip", "1", "--directory", temp_dir, patch_file]
+        test_args = [
+            "patch",
+            "--strip",
+            "1",
+            "--directory",
+            str(tmp_path),
+            str(patch_file),
+        ]
 
-        with mock_patch.object(sys, "argv", test_args):
-            try:
-                main()
-            except SystemExit as e:
-                assert e.code == 0
+        assert _run_main(test_args) == 0
 
     def test_main_with_revert_option(
-        self, temp_dir, sample_patch_content, expected_patched_content
+        self, tmp_path, sample_patch_file, expected_patched_content
     ):
         """Test main function with --revert option."""
-        patch_file = os.path.join(temp_dir, "test.patch")
-        with open(patch_file, "wb") as f:
-            f.write(sample_patch_content)
+        patch_file = str(sample_patch_file)
 
         # Create file with already patched content
-        source_file = os.path.join(temp_dir, "test.txt")
-        with open(source_file, "wb") as f:
-            f.write(expected_patched_content)
+        source_file = tmp_path / "test.txt"
+        source_file.write_bytes(expected_patched_content)
 
-        test_args = ["patch", "--revert", "--directory", temp_dir, patch_file]
+        test_args = ["patch", "--revert", "--directory", str(tmp_path), patch_file]
 
-        with mock_patch.object(sys, "argv", test_args):
+        with _argv(test_args):
             try:
                 main()
                 # Check that file was reverted
@@ -252,12 +208,12 @@ index 1234567..abcdefg 100644
             except SystemExit as e:
                 assert e.code == 0
 
-    def test_main_with_stdin_input(self, sample_patch_content):
-        """Test main function with stdin input."""
+    def test_main_with_stdin_input(self, sample_patch_content_str):
+        """Test main function with text stdin input."""
         test_args = ["patch", "--"]
 
-        with mock_patch.object(sys, "argv", test_args), mock_patch(
-            "sys.stdin", StringIO(sample_patch_content.decode())
+        with _argv(test_args), mock_patch(
+            "sys.stdin", StringIO(sample_patch_content_str)
         ):
 
             try:
@@ -274,7 +230,7 @@ index 1234567..abcdefg 100644
         mock_response.read.return_value = sample_patch_content
         mock_response.__iter__.return_value = iter(sample_patch_content.split(b"\n"))
 
-        with mock_patch.object(sys, "argv", test_args), mock_patch(
+        with _argv(test_args), mock_patch(
             "patch.compat.urllib_request.urlopen", return_value=mock_response
         ):
 
@@ -289,7 +245,7 @@ index 1234567..abcdefg 100644
         # Test with invalid patch file
         test_args = ["patch", "/dev/null"]  # Empty file
 
-        with mock_patch.object(sys, "argv", test_args):
+        with _argv(test_args):
             with pytest.raises(SystemExit) as exc_info:
                 main()
 
@@ -306,7 +262,7 @@ class TestCliArgumentParsing:
         # So we test through the main function behavior
         test_args = ["patch", "--help"]
 
-        with mock_patch.object(sys, "argv", test_args):
+        with _argv(test_args):
             with pytest.raises(SystemExit):
                 main()
 
@@ -314,7 +270,7 @@ class TestCliArgumentParsing:
         """Test handling of invalid options."""
         test_args = ["patch", "--invalid-option"]
 
-        with mock_patch.object(sys, "argv", test_args):
+        with _argv(test_args):
             with pytest.raises(SystemExit) as exc_info:
                 main()
 
@@ -325,7 +281,7 @@ class TestCliArgumentParsing:
         """Test validation of strip option."""
         test_args = ["patch", "--strip", "invalid", "test.patch"]
 
-        with mock_patch.object(sys, "argv", test_args):
+        with _argv(test_args):
             try:
                 main()
             except SystemExit as e:
@@ -342,23 +298,21 @@ class TestCliIntegration:
         if git_patch_file.exists():
             test_args = ["patch", "--diffstat", str(git_patch_file)]
 
-            with mock_patch.object(sys, "argv", test_args):
+            with _argv(test_args):
                 with pytest.raises(SystemExit) as exc_info:
                     main()
 
                 # Should succeed with diffstat
                 assert exc_info.value.code == 0
 
-    def test_cli_logging_configuration(self, temp_dir, sample_patch_content):
+    def test_cli_logging_configuration(self, sample_patch_file):
         """Test that CLI properly configures logging."""
-        patch_file = os.path.join(temp_dir, "test.patch")
-        with open(patch_file, "wb") as f:
-            f.write(sample_patch_content)
+        patch_file = str(sample_patch_file)
 
         # Test with debug option
         test_args = ["patch", "--debug", "--diffstat", patch_file]
 
-        with mock_patch.object(sys, "argv", test_args):
+        with _argv(test_args):
             with pytest.raises(SystemExit) as exc_info:
                 main()
 
@@ -370,82 +324,66 @@ class TestCliIntegration:
 
             assert patch.logging_utils.debugmode is True
 
-    def test_cli_verbosity_levels(self, temp_dir, sample_patch_content):
+    def test_cli_verbosity_levels(self, sample_patch_file):
         """Test different verbosity levels."""
-        patch_file = os.path.join(temp_dir, "test.patch")
-        with open(patch_file, "wb") as f:
-            f.write(sample_patch_content)
+        patch_file = str(sample_patch_file)
 
         verbosity_options = ["--quiet", "--verbose"]
 
         for option in verbosity_options:
-            test_args = ["patch", option, "--diffstat", patch_file]
-
-            with mock_patch.object(sys, "argv", test_args):
-                with pytest.raises(SystemExit) as exc_info:
-                    main()
-
-                # Should succeed regardless of verbosity
-                assert exc_info.value.code == 0
+            # Should succeed regardless of verbosity
+            assert _run_main(["patch", option, "--diffstat", patch_file]) == 0
 
 
 class TestCliErrorScenarios:
     """Test CLI error scenarios."""
 
-    def test_cli_with_corrupted_patch(self, temp_dir):
+    def test_cli_with_corrupted_patch(self, tmp_path):
         """Test CLI with corrupted patch file."""
-        patch_file = os.path.join(temp_dir, "corrupted.patch")
-        with open(patch_file, "wb") as f:
-            f.write(b"This is not a valid patch file\n")
+        patch_file = tmp_path / "corrupted.patch"
+        patch_file.write_bytes(b"This is not a valid patch file\n")
 
-        test_args = ["patch", patch_file]
+        test_args = ["patch", str(patch_file)]
 
-        with mock_patch.object(sys, "argv", test_args):
+        with _argv(test_args):
             with pytest.raises(SystemExit) as exc_info:
                 main()
 
             # Should exit with error code
             assert exc_info.value.code != 0
 
-    def test_cli_with_permission_error(self, temp_dir, sample_patch_content):
-        """Test CLI with permission errors."""
-        patch_file = os.path.join(temp_dir, "test.patch")
-        with open(patch_file, "wb") as f:
-            f.write(sample_patch_content)
-
-        # Create read-only source file
-        source_file = os.path.join(temp_dir, "test.txt")
-        with open(source_file, "wb") as f:
-            f.write(b"line1\nline2\nline3\n")
-
-        # Make file read-only
-        os.chmod(source_file, 0o444)
-
-        test_args = ["patch", patch_file]
+    @pytest.mark.skipif(os.name == "nt", reason="chmod does not protect directories")
+    def test_cli_with_permission_error(self, tmp_path, sample_patch_file):
+        """Test CLI when the target directory is read-only."""
+        source_file = tmp_path / "test.txt"
+        source_file.write_bytes(b"line1\nline2\nline3\n")
 
+        # apply() moves the target to a backup, which needs a writable directory
+        os.chmod(tmp_path, 0o555)
         try:
-            with mock_patch.object(sys, "argv", test_args):
-                with mock_patch("os.getcwd", return_value=temp_dir):
-                    with pytest.raises(SystemExit) as exc_info:
-                        main()
+            if os.access(tmp_path, os.W_OK):
+                pytest.skip("read-only directory is still writable, e.g. as root")
 
-                    # Should exit with error code due to permission error
-                    assert exc_info.value.code != 0
+            test_args = ["patch", "--directory", str(tmp_path), str(sample_patch_file)]
+            with _argv(test_args):
+                with pytest.raises(PermissionError):
+                    main()
         finally:
             # Restore permissions for cleanup
-            os.chmod(source_file, 0o644)
+            os.chmod(tmp_path, 0o755)
+
+        assert source_file.read_bytes() == b"line1\nline2\nline3\n"
+        assert os.listdir(tmp_path) == ["test.txt"]
 
-    def test_cli_with_missing_target_file(self, temp_dir, sample_patch_content):
+    def test_cli_with_missing_target_file(self, tmp_path, sample_patch_file):
         """Test CLI when target file doesn't exist."""
-        patch_file = os.path.join(temp_dir, "test.patch")
-        with open(patch_file, "wb") as f:
-            f.write(sample_patch_content)
+        patch_file = str(sample_patch_file)
 
         # Don't create the target file
         test_args = ["patch", patch_file]
 
-        with mock_patch.object(sys, "argv", test_args):
-            with mock_patch("os.getcwd", return_value=temp_dir):
+        with _argv(test_args):
+            with mock_patch("os.getcwd", return_value=str(tmp_path)):
                 with pytest.raises(SystemExit) as exc_info:
                     main()
 
@@ -464,20 +402,16 @@ class TestCliErrorScenarios:
         ("--debug", "enables debug mode"),
     ],
 )
-def test_cli_options_parametrized(
-    option, expected_behavior, temp_dir, sample_patch_content
-):
+def test_cli_options_parametrized(option, expected_behavior, sample_patch_file):
     """Parametrized test for CLI options."""
-    patch_file = os.path.join(temp_dir, "test.patch")
-    with open(patch_file, "wb") as f:
-        f.write(sample_patch_content)
+    patch_file = str(sample_patch_file)
 
     if option in ["--version", "--help"]:
         test_args = ["patch", option]
     else:
         test_args = ["patch", option, patch_file]
 
-    with mock_patch.object(sys, "argv", test_args):
+    with _argv(test_args):
         with pytest.raises(SystemExit) as exc_info:
             main()
 
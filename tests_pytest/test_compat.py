@@ -8,7 +8,14 @@ and import compatibility.
 import pytest
 import sys
 
-from patch.compat import StringIO, urllib_request, PY3K, compat_next, tostr
+from patch.compat import (
+    StringIO,
+    urllib_request,
+    PY3K,
+    compat_next,
+    tostr,
+    fadvise_sequential,
+)
 
 
 class TestPythonVersionDetection:
@@ -254,6 +261,14 @@ class TestTostr:
             assert isinstance(result, bytes)
             assert result == test_bytes
 
+    def test_fadvise_sequential(self, tmp_path):
+        """Test that the read-ahead hint never fails."""
+        path = tmp_path / "data.txt"
+        path.write_bytes(b"line1\nline2\n")
+        with open(path, "rb") as f:
+            fadvise_sequential(f.fileno())
+            assert f.read() == b"line1\nline2\n"
+
     @pytest.mark.parametrize(
         "input_bytes,expected_str",
         [
@@ -4,11 +4,12 @@ Unit tests for core classes (Hunk, Patch, PatchSet).
 Tests the core functionality of the patch parsing and representation classes.
 """
 
+import os
 import pytest
 from io import BytesIO
 
 import patch
-from patch.core import Hunk, Patch, PatchSet
+from patch.core import Hunk, Patch, PatchSet, _count_lineends
 
 
 class TestHunk:
@@ -50,6 +51,30 @@ class TestHunk:
         hunk.invalid = True
         assert hunk.invalid is True
 
+    def test_hunk_finalize(self):
+        """Test precomputed source and target lines."""
+        hunk = Hunk()
+        assert hunk.src_lines is None
+        assert hunk.tgt_lines is None
+
+        hunk.text = [b" context\n", b"-removed\r\n", b"+added\n"]
+        hunk.finalize()
+        assert hunk.src_lines == [b"context", b"removed"]
+        assert hunk.tgt_lines == [b"context", b"added"]
+
+    def test_hunk_finalize_on_parse(self, parsed_git_patch):
+        """Test that parsed hunks are finalized."""
+        hunk = parsed_git_patch.items[0].hunks[0]
+        assert hunk.src_lines == [b"line1", b"line2", b"line3"]
+        assert hunk.tgt_lines == [b"line1", b"line2_modified", b"line3"]
+
+    def test_hunk_slots(self):
+        """Test that Hunk instances do not carry a __dict__."""
+        hunk = Hunk()
+        assert not hasattr(hunk, "__dict__")
+        with pytest.raises(AttributeError):
+            hunk.unknown = True
+
 
 class TestPatch:
     """Test the Patch class."""
@@ -75,6 +100,13 @@ class TestPatch:
         assert patch_obj.target == b"target.txt"
         assert patch_obj.type == "git"
 
+    def test_patch_slots(self):
+        """Test that Patch instances do not carry a __dict__."""
+        patch_obj = Patch()
+        assert not hasattr(patch_obj, "__dict__")
+        with pytest.raises(AttributeError):
+            patch_obj.unknown = True
+
     def test_patch_iteration(self):
         """Test that Patch objects are iterable over hunks."""
         patch_obj = Patch()
@@ -219,6 +251,47 @@ class TestPatchSet:
         assert patchset.errors == 2
         assert patchset.warnings == 3
 
+    def test_patchset_hunkends(self):
+        """Test line end statistics collected for each patch."""
+        content = (
+            b"--- a.txt\n+++ a.txt\n@@ -1 +1 @@\n"
+            b"-old\r\n+new\r\n"
+            b"--- b.txt\n+++ b.txt\n@@ -1 +1 @@\n-old\n+new\n"
+        )
+        patchset = PatchSet(BytesIO(content))
+        assert patchset.items[0].hunkends == {"lf": 0, "crlf": 2, "cr": 0}
+        assert patchset.items[1].hunkends == {"lf": 2, "crlf": 0, "cr": 0}
+
+    @pytest.mark.parametrize(
+        "content,errors,hunks",
+        [
+            (
+                b"--- /dev/null\n+++ /dev/null\n@@ -0,0 +0,0 @@\n"
+                b"index 123\n@@ -3 +3 @@\n-x\n+y\n",
+                1,
+                [(0, True), (3, False)],
+            ),
+            (
+                b"--- a\n+++ a\n@@ -0,0 +0,0 @@\n@@ -1 +1 @@\n c\n",
+                1,
+                [(0, True), (1, False)],
+            ),
+            (
+                b"--- a\n+++ a\n@@ -0,0 +0,0 @@\n@@ -0,0 +0,0 @@\n",
+                2,
+                [(0, True)],
+            ),
+        ],
+        ids=["index_line", "next_header", "repeated_header"],
+    )
+    def test_patchset_invalid_hunk_recorded_once(self, content, errors, hunks):
+        """Test that an invalid hunk is added once and the next one is parsed."""
+        patchset = PatchSet(BytesIO(content))
+        assert patchset.errors == errors
+        assert patchset.warnings == 0
+        assert len(patchset.items) == 1
+        assert [(h.startsrc, h.invalid) for h in patchset.items[0].hunks] == hunks
+
     def test_patchset_type_detection(self, sample_git_patch):
         """Test patch type detection."""
         patchset = PatchSet()
@@ -267,6 +340,66 @@ class TestPatchSetIntegration:
             assert patchset.type == patch.HG
             assert len(patchset.items) >= 1
 
+    def test_apply_large_file(self, temp_dir):
+        """Test applying a patch to a file large enough to be mmapped."""
+        lines = [b"line %d\n" % i for i in range(20000)]
+        target = os.path.join(temp_dir, "large.txt")
+        with open(target, "wb") as f:
+            f.writelines(lines)
+
+        content = (
+            b"--- large.txt\n+++ large.txt\n@@ -10000,3 +10000,3 @@\n"
+            b" line 9999\n-line 10000\n+changed\n line 10001\n"
+        )
+        patchset = PatchSet(BytesIO(content))
+        assert patchset.apply(root=temp_dir)
+
+        lines[10000] = b"changed\n"
+        with open(target, "rb") as f:
+            assert f.read() == b"".join(lines)
+
+    def test_apply_chained_entries_for_same_file(self, temp_dir):
+        """Test that a later entry sees the changes of an earlier one."""
+        target = os.path.join(temp_dir, "same.txt")
+        with open(target, "wb") as f:
+            f.write(b"a\nb\nc\n")
+
+        content = (
+            b"--- same.txt\n+++ same.txt\n@@ -1,3 +1,3 @@\n a\n-b\n+B\n c\n"
+            b"--- same.txt\n+++ same.txt\n@@ -1,3 +1,3 @@\n a\n-B\n+X\n c\n"
+        )
+        patchset = PatchSet(BytesIO(content))
+        assert len(patchset.items) == 2
+        assert patchset.apply(root=temp_dir)
+
+        with open(target, "rb") as f:
+            assert f.read() == b"a\nX\nc\n"
+
+    def test_apply_conflicting_entries_for_same_file(self, temp_dir):
+        """Test that entries made against the same base are not both applied."""
+        original = b"a\nb\nc\nd\ne\nf\ng\nh\n"
+        target = os.path.join(temp_dir, "same.txt")
+        with open(target, "wb") as f:
+            f.write(original)
+
+        content = (
+            b"--- same.txt\n+++ same.txt\n@@ -1,2 +1,4 @@\n+new1\n+new2\n a\n b\n"
+            b"--- same.txt\n+++ same.txt\n@@ -6,3 +6,3 @@\n f\n-g\n+G\n h\n"
+        )
+        patchset = PatchSet(BytesIO(content))
+        assert len(patchset.items) == 2
+        assert not patchset.apply(root=temp_dir)
+
+        with open(target, "rb") as f:
+            assert f.read() == b"new1\nnew2\n" + original
+
+
+def test_count_lineends_anywhere_in_list():
+    """Test that bare CR ends are counted wherever they appear."""
+    lines = [b"a\r", b"b\r\n", b"c\rd\n", b"e\r", b"f"]
+    assert _count_lineends(lines) == (1, 1, 2)
+    assert _count_lineends([]) == (0, 0, 0)
+
 
 @pytest.mark.parametrize(
     "patch_content,expected_type",
@@ -276,6 +409,7 @@ class TestPatchSetIntegration:
             patch.PLAIN,
         ),
     ],
+    ids=["plain"],
 )
 def test_patch_type_detection_parametrized(patch_content, expected_type):
     """Parametrized test for patch type detection."""
@@ -0,0 +1,66 @@
+"""
+Smoke tests mirroring the checks run by measure_coverage.py.
+
+Each check is an independent parametrized case, so failures are reported
+individually and the cases can be distributed by pytest-xdist.
+"""
+
+import pytest
+
+import patch
+from patch.utils import xisabs, xnormpath, xstrip, pathstrip
+
+_PATCH_CONTENT = b"--- a/test.txt\n+++ b/test.txt\n@@ -1,1 +1,1 @@\n-old\n+new\n"
+
+
+def _basic_parse():
+    patchset = patch.fromstring(_PATCH_CONTENT)
+    assert patchset is not False
+    assert "test.txt" in patchset.diffstat()
+
+    patches = list(patchset)
+    assert len(patches) == 1
+    assert len(list(patches[0])) == 1
+
+
+def _utilities():
+    assert xisabs(b"/test/path") is True
+    assert xnormpath(b"test/../path") == b"path"
+    assert xstrip(b"/test/path") == b"test/path"
+    assert pathstrip(b"a/b/c/file.txt", 1) == b"b/c/file.txt"
+
+
+def _constants():
+    assert patch.GIT == "git"
+    assert patch.SVN == "svn"
+    assert patch.HG == "mercurial"
+    assert patch.PLAIN == "plain"
+
+
+def _error_handling():
+    assert patch.fromstring(b"invalid patch") is False
+
+
+CASES = [
+    pytest.param(_basic_parse, id="basic_parse"),
+    pytest.param(_utilities, id="utilities"),
+    pytest.param(_constants, id="constants"),
+    pytest.param(_error_handling, id="error_handling"),
+]
+
+
+@pytest.mark.parametrize("check", CASES)
+def test_coverage_case(check):
+    """Run a single coverage smoke check."""
+    check()
+
+
+@pytest.mark.integration
+def test_coverage_file_ops(tmp_path):
+    """Check that a patch file on disk can be parsed."""
+    patch_file = tmp_path / "test.patch"
+    patch_file.write_bytes(_PATCH_CONTENT)
+
+    patchset = patch.fromfile(str(patch_file))
+    assert patchset is not False
+    assert len(patchset.items) == 1
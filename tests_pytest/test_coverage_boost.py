@@ -336,21 +336,26 @@ class TestIntegrationEdgeCases:
         patchset = patch.fromstring(patch_content)
         assert patchset is not False
 
-        original_dir = os.getcwd()
-        try:
-            os.chdir(temp_dir)
-
-            # Apply patch (this might create backup depending on implementation)
-            result = patchset.apply()
-            assert result is True
-
-            # Verify file was modified
-            with open(source_file, "rb") as f:
-                content = f.read()
-            assert b"modified line2" in content
+        # Apply patch (this might create backup depending on implementation)
+        result = patchset.apply(root=temp_dir)
+        assert result is True
+
+        # Verify file was modified
+        with open(source_file, "rb") as f:
+            content = f.read()
+        assert b"modified line2" in content
+
+    def test_patch_apply_in_memory(self):
+        """Test applying parsed hunks to an in-memory stream."""
+        patchset = patch.fromstring(
+            b"--- a/test.txt\n+++ b/test.txt\n@@ -1,3 +1,3 @@\n"
+            b" line1\n-line2\n+modified line2\n line3\n"
+        )
+        assert patchset is not False
 
-        finally:
-            os.chdir(original_dir)
+        source = BytesIO(b"line1\nline2\nline3\n")
+        result = b"".join(patch_stream(source, patchset.items[0].hunks))
+        assert result == b"line1\nmodified line2\nline3\n"
 
     def test_patch_with_conflicting_changes(self, temp_dir):
         """Test patch application with conflicting changes."""
@@ -374,16 +379,9 @@ class TestIntegrationEdgeCases:
         patchset = patch.fromstring(patch_content)
         assert patchset is not False
 
-        original_dir = os.getcwd()
-        try:
-            os.chdir(temp_dir)
-
-            # Should fail due to conflict
-            result = patchset.apply()
-            assert result is False
-
-        finally:
-            os.chdir(original_dir)
+        # Should fail due to conflict
+        result = patchset.apply(root=temp_dir)
+        assert result is False
 
 
 @pytest.mark.parametrize(
@@ -69,6 +69,9 @@ class TestXisabs:
             (b"c:\\", True),
             (b"c:/", True),
             (b"\\", True),
+            (b"1:/", True),
+            (b"_:\\", True),
+            (b"-:/", False),
             (b"path", False),
             (b"./path", False),
             (b"", False),
@@ -95,6 +98,7 @@ class TestXnormpath:
             xnormpath(b"../something/..\\..\\file.to.patch") == b"../../file.to.patch"
         )
         assert xnormpath(b"path/../other/../final") == b"final"
+        assert xnormpath(b"dir\\../other/..\\final") == b"final"
         assert xnormpath(b"./path/./to/./file") == b"path/to/file"
 
     def test_xnormpath_multiple_separators(self):
@@ -258,6 +262,8 @@ class TestPathstrip:
             (b"path/name.diff", 1, b"name.diff"),
             (b"name.diff", 0, b"name.diff"),
             (b"name.diff", 1, b"name.diff"),
+            (b"path\\to\\name.diff", 1, b"to/name.diff"),
+            (b"path//to/name.diff", 1, b"to/name.diff"),
         ],
     )
     def test_pathstrip_parametrized(self, path, n, expected):